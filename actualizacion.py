@@ -0,0 +1,88 @@
+import threading
+import time
+
+# Segundos entre revisiones del actualizador en segundo plano
+INTERVALO_ACTUALIZACION = 60
+# Revisiones fallidas seguidas tras las que un dato publicado deja de usarse
+REVISIONES_VIGENCIA = 3
+
+# Datos publicados: nombre -> {"version", "valor", "hora"}
+_publicados = {}
+_publicados_lock = threading.Lock()
+
+# Intervalo con que se inició el actualizador; define la vigencia de lo publicado
+_config = {"intervalo": INTERVALO_ACTUALIZACION}
+
+def publicar(nombre, version, valor):
+    """Reemplaza de una vez el dato publicado con ese nombre"""
+    with _publicados_lock:
+        _publicados[nombre] = {"version": version, "valor": valor, "hora": time.monotonic()}
+
+def retirar(nombre):
+    """Elimina el dato publicado con ese nombre (p. ej. al descartar su proyecto)"""
+    with _publicados_lock:
+        _publicados.pop(nombre, None)
+
+def _confirmar(nombre, version):
+    """Marca como vigente el dato publicado si sigue siendo esa versión"""
+    with _publicados_lock:
+        entrada = _publicados.get(nombre)
+        if entrada is not None and entrada["version"] == version:
+            _publicados[nombre] = dict(entrada, hora=time.monotonic())
+
+def obtener_publicado(nombre, version=None, vigencia=None):
+    """Devuelve el dato publicado, o None si no existe, no es la versión pedida
+    o el actualizador no lo ha confirmado en los últimos vigencia segundos
+    (por defecto REVISIONES_VIGENCIA intervalos del actualizador)"""
+    if vigencia is None:
+        vigencia = _config["intervalo"] * REVISIONES_VIGENCIA
+    with _publicados_lock:
+        entrada = _publicados.get(nombre)
+    if entrada is None or time.monotonic() - entrada["hora"] > vigencia:
+        return None
+    if version is not None and entrada["version"] != version:
+        return None
+    return entrada["valor"]
+
+def _revisar(tareas):
+    """Ejecuta una vez cada tarea y publica los datos que cambiaron"""
+    for nombre, tarea in tareas.items():
+        with _publicados_lock:
+            entrada = _publicados.get(nombre)
+        version_actual = entrada["version"] if entrada is not None else None
+
+        try:
+            version, valor = tarea(version_actual)
+        except Exception as e:
+            continue
+
+        if version is None:
+            continue
+        if version == version_actual:
+            _confirmar(nombre, version)
+        elif valor is not None:
+            publicar(nombre, version, valor)
+
+def _ciclo(tareas, intervalo, detener):
+    """Bucle del hilo actualizador"""
+    while not detener.is_set():
+        _revisar(tareas)
+        detener.wait(intervalo)
+
+def iniciar_actualizacion(tareas, intervalo=INTERVALO_ACTUALIZACION):
+    """Inicia un hilo que mantiene actualizados los datos de las tareas.
+
+    tareas es un diccionario nombre -> función que recibe la versión publicada
+    y devuelve (version, valor). Si la versión no cambió, valor puede ser None
+    y solo se confirma el dato publicado; si cambió, el nuevo valor se prepara
+    completo en el hilo y luego se publica de una vez, así quien lee con
+    obtener_publicado siempre ve una versión entera. Devuelve el evento que
+    detiene el hilo.
+    """
+    _config["intervalo"] = intervalo
+    detener = threading.Event()
+    hilo = threading.Thread(
+        target=_ciclo, args=(tareas, intervalo, detener), name="actualizacion-drive", daemon=True
+    )
+    hilo.start()
+    return detener
@@ -0,0 +1,299 @@
+"""API HTTP/JSON de solo lectura con los agregados del dashboard.
+
+Sirve las mismas tablas que el dashboard sin pasar por Streamlit:
+
+    GET /avance?metrica=VolumenHA&nivel=...&elemento=...
+        Si/No/Total por (Nivel, Elementos) de una métrica del avance general.
+    GET /semanal?nivel=...&elemento=...&desde=AAAA-MM-DD&hasta=AAAA-MM-DD
+        Tabla semanal (semanas, diferencias, Total y % Avance) del rango de fechas.
+
+Cada respuesta lleva un ETag derivado de la versión del dataset y de la
+consulta: si el cliente lo envía en If-None-Match y los datos no cambiaron
+recibe un 304 sin cuerpo. Las respuestas se comprimen con gzip si el cliente
+lo acepta. Los datos se leen igual que en reporte.py (archivos locales o Drive).
+
+Uso:
+    python api.py --puerto 8502
+    python api.py --credenciales cuenta.json --file-id ID --folder-id ID
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+from diagnostico import activar_log, ejecucion
+from drive import descargar_flujo, obtener_metadatos, servicio_del_hilo, MAX_DESCARGAS_CONCURRENTES
+from procesamiento import (
+    avance_semanal, cargar_ao_general_local, cargar_ao_general_version, cargar_resumenes_semanales,
+    columnas_texto, construir_pivot_semanal, filtrar_nivel_elemento, firma_archivo, resumenes_avance,
+    unir_resumenes_semanales, version_archivos, METRICAS_AVANCE, PROCESOS_LECTURA
+)
+from proyectos import fijar_presupuesto, memo
+from reporte import archivos_semanales, crear_servicio
+
+# Segundos durante los que se reutiliza la versión consultada de los datos
+INTERVALO_REVISION = 60
+# Respuestas más chicas que esto no se comprimen
+MIN_BYTES_GZIP = 1024
+
+# Clave con que la API guarda sus datos en el cache de proyectos
+PROYECTO_API = "api"
+# Memoria máxima (MB) de los datos y respuestas cacheados por la API
+PRESUPUESTO_API_MB = 256
+
+class Datos:
+    """Origen de los datos de la API (archivos locales o Drive) y sus versiones"""
+
+    def __init__(self, args, creds=None):
+        self.args = args
+        self.creds = creds
+        self._revisiones = {}
+        self._revisando = {}
+        self._lock = threading.Lock()
+
+    @property
+    def service(self):
+        """Cliente de Drive del hilo que atiende la consulta (None sin credenciales)"""
+        return servicio_del_hilo(self.creds) if self.creds is not None else None
+
+    def _revisado(self, nombre, obtener):
+        """Resultado de obtener(), reutilizado durante INTERVALO_REVISION segundos.
+
+        Una sola consulta por nombre a la vez: las que llegan mientras otra
+        revisa esperan y reutilizan su resultado.
+        """
+        with self._lock:
+            revisando = self._revisando.setdefault(nombre, threading.Lock())
+        with revisando:
+            with self._lock:
+                hora, valor = self._revisiones.get(nombre, (None, None))
+            if hora is not None and time.monotonic() - hora < self.args.intervalo:
+                return valor
+            valor = obtener()
+            with self._lock:
+                self._revisiones[nombre] = (time.monotonic(), valor)
+            return valor
+
+    def version_general(self):
+        """Versión del AO_GENERAL (md5Checksum en Drive, firma del archivo local)"""
+        def obtener():
+            if self.creds is not None and self.args.file_id:
+                metadatos = obtener_metadatos(self.service, self.args.file_id)
+                return metadatos.get('md5Checksum') or metadatos.get('modifiedTime')
+            if os.path.exists(self.args.general):
+                return firma_archivo(self.args.general)
+            return None
+        return self._revisado("general", obtener)
+
+    def resumenes(self, version):
+        """Resúmenes Si/No/Total de las tres métricas de una versión del AO_GENERAL"""
+        def calcular():
+            if self.creds is not None and self.args.file_id:
+                df = cargar_ao_general_version(version, lambda: descargar_flujo(self.service, self.args.file_id))
+            else:
+                df = cargar_ao_general_local(self.args.general, version)
+            return resumenes_avance(df) if df is not None else None
+        return memo(PROYECTO_API, ("resumenes_avance", version), calcular)
+
+    def archivos(self):
+        """(file_id, modifiedTime, fecha) de los archivos semanales"""
+        return self._revisado("semanal", lambda: archivos_semanales(self.args, self.service))
+
+    def avance_semanal(self, archivos, version):
+        """VolumenHA por (Nivel, Elementos, Fecha) de una versión del conjunto de archivos"""
+        def calcular():
+            resumenes = cargar_resumenes_semanales(
+                archivos, service=self.service, creds=self.creds,
+                max_concurrentes=MAX_DESCARGAS_CONCURRENTES, procesos=self.args.procesos
+            )
+            return avance_semanal(unir_resumenes_semanales(resumenes))
+        return memo(PROYECTO_API, ("semanal", version), calcular)
+
+def _filas(tabla):
+    """Filas de una tabla como lista de dicts JSON (NaN como null, fechas ISO)"""
+    return json.loads(columnas_texto(tabla).to_json(orient="records", date_format="iso", force_ascii=False))
+
+def _fecha(params, nombre):
+    """Fecha AAAA-MM-DD de un parámetro; None si no se indicó"""
+    if not params.get(nombre):
+        return None
+    try:
+        return pd.to_datetime(params[nombre], format="%Y-%m-%d")
+    except ValueError as e:
+        raise ValueError(f"{nombre} debe tener el formato AAAA-MM-DD")
+
+def consultar_avance(datos, params):
+    """Consulta /avance: devuelve (versión, parámetros validados, función que arma la respuesta)"""
+    metrica = params.get("metrica", "VolumenHA")
+    if metrica not in METRICAS_AVANCE:
+        raise ValueError(f"metrica debe ser una de: {', '.join(METRICAS_AVANCE)}")
+    nivel, elemento = params.get("nivel", "Todos"), params.get("elemento", "Todos")
+
+    version = datos.version_general()
+
+    def responder():
+        resumen = (datos.resumenes(version) or {}).get(metrica)
+        if resumen is None:
+            return None
+        tabla = filtrar_nivel_elemento(resumen, nivel, elemento)
+        return {
+            "version": version,
+            "metrica": metrica,
+            "nivel": nivel,
+            "elemento": elemento,
+            "totales": {col: round(float(tabla[col].sum()), 2) for col in ["Si", "No", "Total"]},
+            "filas": _filas(tabla),
+        }
+    return version, (metrica, nivel, elemento), responder
+
+def consultar_semanal(datos, params):
+    """Consulta /semanal: devuelve (versión, parámetros validados, función que arma la respuesta)"""
+    nivel, elemento = params.get("nivel", "Todos"), params.get("elemento", "Todos")
+    desde, hasta = _fecha(params, "desde"), _fecha(params, "hasta")
+
+    archivos = datos.archivos()
+    version = version_archivos(archivos) if archivos else None
+
+    def responder():
+        df_semana = datos.avance_semanal(archivos, version)
+        if desde is not None:
+            df_semana = df_semana[df_semana["Fecha"] >= desde]
+        if hasta is not None:
+            df_semana = df_semana[df_semana["Fecha"] <= hasta]
+        fechas = sorted(df_semana["Fecha"].unique())
+        if not fechas:
+            return {"version": version, "nivel": nivel, "elemento": elemento, "fechas": [], "filas": []}
+        tabla = filtrar_nivel_elemento(construir_pivot_semanal(df_semana, fechas), nivel, elemento)
+        return {
+            "version": version,
+            "nivel": nivel,
+            "elemento": elemento,
+            "fechas": [fecha.strftime("%Y-%m-%d") for fecha in fechas],
+            "filas": _filas(tabla),
+        }
+    return version, (nivel, elemento, desde, hasta), responder
+
+CONSULTAS = {
+    "/avance": consultar_avance,
+    "/semanal": consultar_semanal,
+}
+
+class ManejadorAPI(BaseHTTPRequestHandler):
+    """Atiende las consultas GET de la API"""
+
+    def do_GET(self):
+        with ejecucion():
+            self._atender()
+
+    def _atender(self):
+        url = urlparse(self.path)
+        ruta = url.path.rstrip("/") or "/"
+        params = {clave: valores[-1] for clave, valores in parse_qs(url.query).items()}
+
+        consulta = CONSULTAS.get(ruta)
+        if consulta is None:
+            return self._responder(404, {"error": "ruta desconocida", "rutas": list(CONSULTAS)})
+
+        try:
+            version, validados, responder = consulta(self.server.datos, params)
+        except ValueError as e:
+            return self._responder(400, {"error": str(e)})
+        except Exception as e:
+            return self._responder(503, {"error": "no se pudo consultar la versión de los datos"})
+        if version is None:
+            return self._responder(503, {"error": "no hay datos disponibles"})
+
+        # El ETag cambia con la versión del dataset y con los parámetros
+        # validados (con sus valores por defecto); los desconocidos no cuentan
+        consulta_normalizada = repr((version, ruta, validados))
+        etag = 'W/"' + hashlib.sha1(consulta_normalizada.encode('utf-8')).hexdigest() + '"'
+        enviados = [e.strip() for e in self.headers.get("If-None-Match", "").split(",")]
+        if etag in enviados or "*" in enviados:
+            return self._responder(304, None, etag)
+
+        try:
+            cuerpo = memo(PROYECTO_API, (f"respuesta{ruta}", version, consulta_normalizada), lambda: _json(responder()))
+        except Exception as e:
+            return self._responder(500, {"error": "no se pudieron calcular los datos"})
+        if cuerpo is None:
+            return self._responder(503, {"error": "no hay datos disponibles"})
+        self._responder(200, cuerpo, etag)
+
+    def _responder(self, estado, cuerpo, etag=None):
+        """Envía la respuesta (dict o JSON ya serializado) con gzip si el cliente lo acepta"""
+        if isinstance(cuerpo, dict):
+            cuerpo = _json(cuerpo)
+        self.send_response(estado)
+        if etag is not None:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+        self.send_header("Vary", "Accept-Encoding")
+        if cuerpo is None:
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if len(cuerpo) >= MIN_BYTES_GZIP and "gzip" in self.headers.get("Accept-Encoding", ""):
+            cuerpo = gzip.compress(cuerpo, compresslevel=6)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+def _json(valor):
+    """Serializa a JSON UTF-8 (None si no hay valor)"""
+    if valor is None:
+        return None
+    return json.dumps(valor, ensure_ascii=False).encode('utf-8')
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8502)
+    parser.add_argument("--general", default="AO_GENERAL.txt", help="AO_GENERAL local (sin --file-id)")
+    parser.add_argument("--semanal", default="REPORTE SEMANAL", help="carpeta semanal local (sin --folder-id)")
+    parser.add_argument("--credenciales", help="JSON de la Service Account para leer desde Google Drive")
+    parser.add_argument("--file-id", help="ID del AO_GENERAL en Drive")
+    parser.add_argument("--folder-id", help="ID de la carpeta REPORTE SEMANAL en Drive")
+    parser.add_argument("--intervalo", type=int, default=INTERVALO_REVISION,
+                        help="segundos entre consultas de la versión de los datos")
+    parser.add_argument("--procesos", type=int, default=PROCESOS_LECTURA,
+                        help="procesos para resumir los archivos semanales (1 = en el proceso actual)")
+    parser.add_argument("--memoria", type=int, default=PRESUPUESTO_API_MB,
+                        help="MB máximos de datos y respuestas cacheados")
+    parser.add_argument("--diagnostico", action="store_true", help="escribe en consola los tiempos de cada consulta")
+    args = parser.parse_args(argv)
+
+    if args.diagnostico:
+        activar_log()
+    fijar_presupuesto(args.memoria)
+
+    creds = None
+    if args.credenciales:
+        service, creds = crear_servicio(args.credenciales)
+        if service is None:
+            print("No se pudieron crear las credenciales de Google Drive", file=sys.stderr)
+            return 1
+
+    servidor = ThreadingHTTPServer((args.host, args.puerto), ManejadorAPI)
+    # Cada hilo del servidor usa su propio cliente de Drive (httplib2 no es thread-safe)
+    servidor.datos = Datos(args, creds)
+    print(f"API en http://{args.host}:{args.puerto} ({', '.join(CONSULTAS)})")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
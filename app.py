@@ -1,21 +1,42 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
 import re
-import plotly.express as px
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
-import io
 import json
-import time
-import ssl
-import urllib3
-from urllib3.util.retry import Retry
-from requests.adapters import HTTPAdapter
-import requests
 import os
-from datetime import datetime
+import time
+from drive import (
+    crear_credenciales, construir_servicio, descargar_flujo, obtener_metadatos, servicio_del_hilo,
+    MAX_DESCARGAS_CONCURRENTES
+)
+from diagnostico import con_cache, tramo, ejecucion, ejecuciones_recientes, totales, activar_log
+from actualizacion import iniciar_actualizacion, obtener_publicado, retirar, INTERVALO_ACTUALIZACION
+from proyectos import (
+    registro_proyectos, memo, en_memoria, al_descartar, fijar_presupuesto, uso_memoria,
+    PRESUPUESTO_MEMORIA_MB, PROYECTO_LOCAL
+)
+from procesamiento import (
+    cargar_ao_general_local, cargar_ao_general_version, firma_archivo, cargar_resumenes_semanales, leer_ao_general_cacheado,
+    resumenes_avance, version_archivos, unir_resumenes_semanales, avance_semanal, avance_trisemanal,
+    construir_pivot_semanal, construir_pivot_trisemanal, ventana_semanal, tabla_para_mostrar, SEMANAS_VISIBLES,
+    PROCESOS_LECTURA, ordenar_por_fecha, listar_semanales_drive, filtrar_nivel_elemento, series_tendencia,
+    series_para_grafico, PUNTOS_TENDENCIA
+)
+
+# Segundos entre consultas de la versión del AO_GENERAL en Drive
+INTERVALO_REVISION_GENERAL = 60
+# Segundos durante los que se reutiliza el AO_GENERAL descargado cuando no se
+# pueden consultar sus metadatos
+TTL_SIN_METADATOS = 3600
+# Filas máximas que se envían a cada grilla AgGrid; las tablas más grandes se
+# paginan por Niveles completos
+FILAS_POR_PAGINA_GRILLA = 1000
+
+# Los DataFrames cacheados se comparten entre sesiones sin copiarlos: con
+# copy-on-write, filtrar o seleccionar columnas nunca modifica el original
+try:
+    pd.set_option("mode.copy_on_write", True)
+except Exception as e:
+    pass
 
 # Configuración de la página
 st.set_page_config(
@@ -37,10 +58,37 @@ def clean_private_key(private_key_str):
         return cleaned_key
     return private_key_str
 
+def leer_config(clave, defecto=None):
+    """Lee un valor opcional de st.secrets, devolviendo el valor por defecto si no existe"""
+    try:
+        return st.secrets.get(clave, defecto)
+    except Exception as e:
+        return defecto
+
+def proyectos_configurados():
+    """Proyectos de los secretos (tabla PROYECTOS, o FILE_ID_GENERAL y FOLDER_ID_SEMANAL)"""
+    return registro_proyectos(
+        leer_config("PROYECTOS", None), leer_config("FILE_ID_GENERAL", None), leer_config("FOLDER_ID_SEMANAL", None)
+    )
+
+def proyecto_actual():
+    """Clave del proyecto que muestra la sesión (PROYECTO_LOCAL con archivos locales)"""
+    return st.session_state.get("proyecto_activo", PROYECTO_LOCAL)
+
+def permite_datos_locales():
+    """Los archivos locales solo reemplazan a Drive con un único proyecto configurado:
+    con varios no se sabe a cuál pertenecen"""
+    return len(proyectos_configurados()) == 1
+
+def proyecto_configurado():
+    """Configuración (nombre, file_id, folder_id) del proyecto de la sesión"""
+    proyectos = proyectos_configurados()
+    return proyectos.get(proyecto_actual()) or next(iter(proyectos.values()))
+
 # Configuración de Google Drive
 @st.cache_resource
-def get_drive_service():
-    """Obtiene el servicio de Google Drive usando las credenciales"""
+def get_drive_credentials():
+    """Obtiene las credenciales de la Service Account desde los secretos"""
     try:
         # Obtener las credenciales de los secretos
         creds_input = st.secrets["GOOGLE_CREDENTIALS"]
@@ -58,189 +106,167 @@ def get_drive_service():
         else:
             return None
         
-        # Verificar que tenga los campos necesarios
-        required_fields = ["type", "project_id", "private_key", "client_email"]
-        missing_fields = [field for field in required_fields if field not in creds_dict]
-        
-        if missing_fields:
-            return None
-        
-        # Crear una copia limpia de las credenciales
-        clean_creds = {
-            "type": creds_dict["type"],
-            "project_id": creds_dict["project_id"],
-            "private_key_id": creds_dict["private_key_id"],
-            "client_email": creds_dict["client_email"],
-            "client_id": creds_dict["client_id"],
-            "auth_uri": creds_dict["auth_uri"],
-            "token_uri": creds_dict["token_uri"],
-            "auth_provider_x509_cert_url": creds_dict["auth_provider_x509_cert_url"],
-            "client_x509_cert_url": creds_dict["client_x509_cert_url"]
-        }
-        
-        # Manejar el private_key de forma especial
-        private_key = creds_dict["private_key"]
-        
-        # Si el private_key tiene \\n, reemplazarlo por \n
-        if "\\n" in private_key:
-            private_key = private_key.replace("\\n", "\n")
-        
-        clean_creds["private_key"] = private_key
-        
-        # Crear las credenciales
-        creds = service_account.Credentials.from_service_account_info(
-            clean_creds,
-            scopes=['https://www.googleapis.com/auth/drive.readonly']
-        )
-        
-        # Construir el servicio
-        service = build('drive', 'v3', credentials=creds)
-        
-        # Probar la conexión
-        try:
-            service.files().list(pageSize=1).execute()
-            return service
-        except Exception as e:
-            return None
-            
+        return crear_credenciales(creds_dict)
     except Exception as e:
         return None
 
-def download_file(service, file_id):
-    """Lee directamente el contenido del archivo desde Google Drive"""
+@st.cache_resource
+def get_drive_service():
+    """Obtiene el servicio de Google Drive usando las credenciales"""
     try:
-        # Leer el archivo directamente desde Google Drive
-        request = service.files().get_media(fileId=file_id)
-        file_content = request.execute()
-        
-        # Convertir el contenido a StringIO para que pandas pueda leerlo
-        from io import StringIO
-        content_str = file_content.decode('utf-8')
-        return StringIO(content_str)
+        creds = get_drive_credentials()
+        if creds is None:
+            return None
         
+        # Construir el servicio (sin petición de prueba: los errores de conexión
+        # se manejan en cada llamada)
+        return construir_servicio(creds)
     except Exception as e:
         return None
 
-def list_files_in_folder(service, folder_id):
-    """Lista archivos en una carpeta de Google Drive"""
-    try:
-        results = service.files().list(
-            q=f"'{folder_id}' in parents",
-            pageSize=1000,
-            fields="files(id, name, modifiedTime)"
-        ).execute()
-        return results.get('files', [])
-    except Exception as e:
-        return []
+@con_cache(st.cache_data(ttl=INTERVALO_REVISION_GENERAL, show_spinner=False))
+def revisar_ao_general(file_id):
+    """Consulta la versión actual (md5Checksum o modifiedTime) del AO_GENERAL en Drive.
+
+    Los errores se propagan para que st.cache_data no guarde el fallo.
+    """
+    metadatos = obtener_metadatos(get_drive_service(), file_id)
+    return metadatos.get('md5Checksum') or metadatos.get('modifiedTime')
+
+def cargar_sin_metadatos(service, proyecto, file_id):
+    """Descarga el AO_GENERAL sin conocer su versión (cache por hash de contenido).
+
+    La descarga se guarda en el cache del proyecto durante TTL_SIN_METADATOS
+    segundos para no repetirla en cada rerun mientras fallen los metadatos.
+    """
+    def descargar():
+        contenido = descargar_flujo(service, file_id)
+        return leer_ao_general_cacheado(contenido) if contenido is not None else None
+    periodo = int(time.time() // TTL_SIN_METADATOS)
+    return memo(proyecto, ("general", f"sin_metadatos:{periodo}"), descargar)
+
+def cargar_datos_drive(proyecto, file_id, version):
+    """Carga una versión del AO_GENERAL desde Drive en el cache del proyecto; solo descarga si no está cacheada"""
+    return memo(
+        proyecto, ("general", version),
+        lambda: cargar_ao_general_version(version, lambda: descargar_flujo(get_drive_service(), file_id))
+    )
+
+def tarea_actualizar_general(creds, proyecto, file_id):
+    """Tarea del actualizador: prepara el AO_GENERAL cuando cambia su versión en Drive"""
+    def tarea(version_actual):
+        # Solo se mantienen al día los proyectos que siguen en memoria
+        if not en_memoria(proyecto):
+            return None, None
+        # El hilo actualizador usa su propio cliente, no el de las sesiones
+        service = servicio_del_hilo(creds)
+        metadatos = obtener_metadatos(service, file_id)
+        version = metadatos.get('md5Checksum') or metadatos.get('modifiedTime')
+        if version == version_actual:
+            return version, None
+        return version, cargar_ao_general_version(version, lambda: descargar_flujo(service, file_id))
+    return tarea
+
+def tarea_actualizar_semanal(creds, proyecto, folder_id, max_concurrentes, procesos):
+    """Tarea del actualizador: prepara el dataset semanal cuando cambia algún archivo"""
+    def tarea(version_actual):
+        if not en_memoria(proyecto):
+            return None, None
+        service = servicio_del_hilo(creds)
+        archivos = identificar_archivos_semanales(listar_semanales_drive(service, folder_id))
+        version = version_archivos(archivos)
+        if version == version_actual:
+            return version, None
+        resumenes = cargar_resumenes_semanales(
+            archivos, service=service, creds=creds, max_concurrentes=max_concurrentes, procesos=procesos
+        )
+        # Solo se publica si se pudieron leer todos los archivos
+        if len(resumenes) != len(archivos):
+            return None, None
+        return version, unir_resumenes_semanales(resumenes)
+    return tarea
+
+@st.cache_resource
+def iniciar_actualizador():
+    """Inicia (una vez por proceso) el hilo que mantiene actualizados los datos de Drive"""
+    creds = get_drive_credentials()
+    if creds is None:
+        return None
+    
+    tareas = {}
+    max_concurrentes = int(leer_config("MAX_DESCARGAS_CONCURRENTES", MAX_DESCARGAS_CONCURRENTES))
+    procesos = int(leer_config("PROCESOS_LECTURA", PROCESOS_LECTURA))
+    for clave, proyecto in proyectos_configurados().items():
+        if proyecto["file_id"]:
+            tareas[f"general:{clave}"] = tarea_actualizar_general(creds, clave, proyecto["file_id"])
+        if proyecto["folder_id"]:
+            tareas[f"semanal:{clave}"] = tarea_actualizar_semanal(
+                creds, clave, proyecto["folder_id"], max_concurrentes, procesos
+            )
+    
+    # Al descartar un proyecto del cache también se liberan sus datos publicados
+    al_descartar(retirar_publicados)
+    return iniciar_actualizacion(tareas, int(leer_config("INTERVALO_ACTUALIZACION", INTERVALO_ACTUALIZACION)))
+
+def retirar_publicados(proyecto):
+    """Elimina los datos que el actualizador publicó para un proyecto"""
+    retirar(f"general:{proyecto}")
+    retirar(f"semanal:{proyecto}")
 
 # Cargar datos desde Google Drive
-@st.cache_data(ttl=3600)  # Cache por 1 hora
 def cargar_datos():
-    """Carga el archivo AO_GENERAL.txt desde Google Drive o local como fallback"""
+    """Carga el archivo AO_GENERAL.txt desde Google Drive o local como fallback.
+
+    Cada INTERVALO_REVISION_GENERAL segundos se consultan solo los metadatos del
+    archivo; el contenido se descarga y procesa únicamente cuando cambia su versión.
+    """
     service = get_drive_service()
+    proyecto = proyecto_actual()
     
     # Intentar cargar desde Google Drive primero
     if service:
+        # Dato ya preparado por el actualizador en segundo plano (se registra
+        # en el cache del proyecto para que cuente como usado)
+        df = obtener_publicado(f"general:{proyecto}")
+        if df is not None:
+            return memo(proyecto, ("general", df.attrs.get("version")), lambda: df)
+        
         try:
-            file_id = st.secrets["FILE_ID_GENERAL"]
-            fh = download_file(service, file_id)
-            if fh:
-                df = pd.read_csv(fh, sep="\t", header=1, dtype=str)
-                df = df.dropna(how="all")
-                
-                # Limpiar columnas
-                df = df.rename(columns=lambda x: x.strip().replace('"', ''))
-                
-                # Convertir tipos de datos
-                for col in ["VolumenHA", "AreaMoldaje", "Cuantia"]:
-                    if col in df.columns:
-                        df[col] = pd.to_numeric(df[col].str.replace(",", ".", regex=False), errors='coerce')
-                
-                if "FC_CON_FECHA EJECUCION" in df.columns:
-                    df["FC_CON_FECHA EJECUCION"] = pd.to_datetime(
-                        df["FC_CON_FECHA EJECUCION"], 
-                        dayfirst=True, 
-                        errors='coerce'
-                    )
-                
+            file_id = proyecto_configurado()["file_id"]
+            if not file_id:
+                return None
+            try:
+                version = revisar_ao_general(file_id)
+            except Exception as e:
+                version = None
+            if version:
+                return cargar_datos_drive(proyecto, file_id, version)
+            
+            # Sin metadatos se descarga directamente
+            df = cargar_sin_metadatos(service, proyecto, file_id)
+            if df is not None:
                 return df
         except Exception as e:
             return None
     
     # Fallback: intentar cargar desde archivo local
-    try:
-        local_file = "AO_GENERAL.txt"
-        if os.path.exists(local_file):
-            df = pd.read_csv(local_file, sep="\t", header=1, dtype=str)
-            df = df.dropna(how="all")
-            
-            # Limpiar columnas
-            df = df.rename(columns=lambda x: x.strip().replace('"', ''))
-            
-            # Convertir tipos de datos
-            for col in ["VolumenHA", "AreaMoldaje", "Cuantia"]:
-                if col in df.columns:
-                    df[col] = pd.to_numeric(df[col].str.replace(",", ".", regex=False), errors='coerce')
-            
-            if "FC_CON_FECHA EJECUCION" in df.columns:
-                df["FC_CON_FECHA EJECUCION"] = pd.to_datetime(
-                    df["FC_CON_FECHA EJECUCION"], 
-                    dayfirst=True, 
-                    errors='coerce'
-                )
-            
-            return df
-        else:
-            return None
-    except Exception as e:
+    if not permite_datos_locales():
+        st.info(f"No se pudieron cargar los datos del proyecto {proyecto_configurado()['nombre']} desde Google Drive.")
         return None
-    
-    return None
+    return cargar_datos_local()
+
+def cargar_archivos_semanales(folder_id):
+    """Carga archivos semanales desde Google Drive o local como fallback.
 
-@st.cache_data(ttl=3600)  # Cache por 1 hora
-def cargar_archivos_semanales():
-    """Carga archivos semanales desde Google Drive o local como fallback"""
+    No se cachea aquí: listar_archivos_carpeta ya reutiliza el listado durante
+    TTL_LISTADO y luego lo revalida con el registro de cambios de Drive.
+    """
     service = get_drive_service()
     
     # Intentar cargar desde Google Drive primero
     if service:
         try:
-            folder_id = st.secrets["FOLDER_ID_SEMANAL"]
-            files = list_files_in_folder(service, folder_id)
-            
-            # Filtrar solo archivos *_AO_GENERAL.txt
-            archivos = [f for f in files if f['name'].endswith('_AO_GENERAL.txt')]
-            
-            def extraer_fecha(nombre):
-                # Intentar diferentes formatos de fecha
-                patterns = [
-                    r"(\d{2}-\d{2}-\d{4})_AO_GENERAL\.txt",  # DD-MM-YYYY
-                    r"(\d{2}-\d{2}-\d{2})_AO_GENERAL\.txt",  # DD-MM-YY
-                    r"(\d{4}-\d{2}-\d{2})_AO_GENERAL\.txt",  # YYYY-MM-DD
-                ]
-                
-                for pattern in patterns:
-                    m = re.match(pattern, nombre)
-                    if m:
-                        fecha_str = m.group(1)
-                        try:
-                            # Intentar diferentes formatos de fecha
-                            if len(fecha_str.split('-')[2]) == 4:  # YYYY
-                                if len(fecha_str.split('-')[0]) == 2:  # DD-MM-YYYY
-                                    return pd.to_datetime(fecha_str, format='%d-%m-%Y', dayfirst=True)
-                                else:  # YYYY-MM-DD
-                                    return pd.to_datetime(fecha_str, format='%Y-%m-%d')
-                            else:  # DD-MM-YY
-                                return pd.to_datetime(fecha_str, format='%d-%m-%y', dayfirst=True)
-                        except:
-                            continue
-                return None
-            
-            archivos_fechas = [(f, extraer_fecha(f['name'])) for f in archivos]
-            archivos_fechas = sorted(
-                [x for x in archivos_fechas if x[1] is not None], 
-                key=lambda x: x[1]
-            )
+            archivos_fechas = listar_semanales_drive(service, folder_id)
             
             if archivos_fechas:
                 return archivos_fechas, service
@@ -248,6 +274,8 @@ def cargar_archivos_semanales():
             return None
     
     # Fallback: intentar cargar desde carpeta local
+    if not permite_datos_locales():
+        return [], service
     try:
         local_folder = "REPORTE SEMANAL"
         if os.path.exists(local_folder):
@@ -259,40 +287,12 @@ def cargar_archivos_semanales():
                     file_obj = {
                         'id': file_path,  # Usar path como ID
                         'name': filename,
-                        'local_path': file_path
+                        'local_path': file_path,
+                        'modifiedTime': firma_archivo(file_path)
                     }
                     archivos.append(file_obj)
             
-            def extraer_fecha(nombre):
-                # Intentar diferentes formatos de fecha
-                patterns = [
-                    r"(\d{2}-\d{2}-\d{4})_AO_GENERAL\.txt",  # DD-MM-YYYY
-                    r"(\d{2}-\d{2}-\d{2})_AO_GENERAL\.txt",  # DD-MM-YY
-                    r"(\d{4}-\d{2}-\d{2})_AO_GENERAL\.txt",  # YYYY-MM-DD
-                ]
-                
-                for pattern in patterns:
-                    m = re.match(pattern, nombre)
-                    if m:
-                        fecha_str = m.group(1)
-                        try:
-                            # Intentar diferentes formatos de fecha
-                            if len(fecha_str.split('-')[2]) == 4:  # YYYY
-                                if len(fecha_str.split('-')[0]) == 2:  # DD-MM-YYYY
-                                    return pd.to_datetime(fecha_str, format='%d-%m-%Y', dayfirst=True)
-                                else:  # YYYY-MM-DD
-                                    return pd.to_datetime(fecha_str, format='%Y-%m-%d')
-                            else:  # DD-MM-YY
-                                return pd.to_datetime(fecha_str, format='%d-%m-%y', dayfirst=True)
-                        except:
-                            continue
-                return None
-            
-            archivos_fechas = [(f, extraer_fecha(f['name'])) for f in archivos]
-            archivos_fechas = sorted(
-                [x for x in archivos_fechas if x[1] is not None], 
-                key=lambda x: x[1]
-            )
+            archivos_fechas = ordenar_por_fecha(archivos)
             
             if archivos_fechas:
                 return archivos_fechas, None  # None indica que es local
@@ -301,9 +301,96 @@ def cargar_archivos_semanales():
     except Exception as e:
         return None
 
+def obtener_resumenes_avance(df):
+    """Resúmenes Si/No/Total por métrica, calculados una vez por dataset cargado"""
+    version = df.attrs.get("version")
+    if version is None:
+        return resumenes_avance(df)
+    return memo(proyecto_actual(), ("resumenes_avance", version), lambda: resumenes_avance(df))
+
+def obtener_vista(version, vista, nivel, elemento, calcular):
+    """Obtiene una vista filtrada del cache del proyecto; sin versión de dataset se calcula directamente.
+
+    Las vistas se guardan por (vista, versión del dataset, nivel, elemento) y
+    se liberan con el resto de los datos del proyecto según el presupuesto de memoria.
+    """
+    if version is None:
+        return calcular()
+    return memo(proyecto_actual(), (f"vista.{vista}", version, nivel, elemento), calcular, nombre="proyecto.vista")
+
+def obtener_agregado(version, nombre, calcular):
+    """Agregado sin filtros del dataset semanal, calculado una vez por versión del
+    dataset; las vistas de cada filtro se obtienen a partir de él"""
+    if version is None:
+        return calcular()
+    return memo(proyecto_actual(), (f"agregado.{nombre}", version), calcular, nombre="proyecto.agregado")
+
+def _calcular_vista_avance(resumen, valor_col, nivel, elemento):
+    """Tabla filtrada, totales y opciones de AgGrid de una tabla de avance general"""
+    from st_aggrid import GridOptionsBuilder
+
+    df_filtrado_tabla = filtrar_nivel_elemento(resumen, nivel, elemento)
+
+    # Configurar AgGrid para jerarquía expandible y columnas visibles
+    gb = GridOptionsBuilder.from_dataframe(df_filtrado_tabla)
+    gb.configure_default_column(resizable=True, filterable=True, sortable=True, editable=False)
+    gb.configure_column("Nivel", rowGroup=True, rowGroupIndex=0)  # visible
+    gb.configure_column("Elementos", rowGroup=True, rowGroupIndex=1)  # visible
+    gb.configure_column("Si", type=["numericColumn", "numberColumnFilter"], width=100, valueFormatter="value.toFixed(2)")
+    gb.configure_column("Si%", type=["numericColumn", "numberColumnFilter"], width=100, valueFormatter="value.toFixed(2) + '%'", cellStyle={"color": "green"})
+    gb.configure_column("No", type=["numericColumn", "numberColumnFilter"], width=100, valueFormatter="value.toFixed(2)")
+    gb.configure_column("No%", type=["numericColumn", "numberColumnFilter"], width=100, valueFormatter="value.toFixed(2) + '%'", cellStyle={"color": "red"})
+    gb.configure_column("Total", type=["numericColumn", "numberColumnFilter"], width=120, valueFormatter="value.toFixed(2)", hide=True)
+    gb.configure_column(valor_col, type=["numericColumn", "numberColumnFilter"], width=120, valueFormatter="value.toFixed(2)")
+    gb.configure_grid_options(
+        domLayout='normal',
+        enableRangeSelection=True,
+        enableCharts=True,
+        groupDisplayType='groupRows',
+        groupDefaultExpanded=0  # Colapsado por defecto
+    )
+
+    # Las opciones se pasan a JSON y de vuelta para que sean dicts simples (serializables)
+    grid_options = json.loads(json.dumps(gb.build()))
+
+    totales = {col: df_filtrado_tabla[col].sum() for col in ["Total", "Si", "No", valor_col]}
+    return {
+        "tabla": df_filtrado_tabla,
+        "totales": totales,
+        "grid_options": grid_options,
+        "paginas": paginar_por_nivel(df_filtrado_tabla, FILAS_POR_PAGINA_GRILLA)
+    }
+
+def paginar_por_nivel(tabla, filas_por_pagina):
+    """Divide la tabla en páginas (etiqueta, inicio, fin) de Niveles completos.
+
+    Cada página junta Niveles consecutivos hasta filas_por_pagina filas, con al
+    menos un Nivel, para que los grupos de la grilla nunca queden partidos.
+    """
+    if len(tabla) <= filas_por_pagina:
+        return [("", 0, len(tabla))]
+    
+    niveles = tabla["Nivel"].astype(str).tolist()
+    inicios_nivel = tabla["Nivel"].ne(tabla["Nivel"].shift()).to_numpy().nonzero()[0].tolist()
+    
+    def etiqueta(inicio, fin):
+        primero, ultimo = niveles[inicio], niveles[fin - 1]
+        return primero if primero == ultimo else f"{primero} – {ultimo}"
+    
+    paginas = []
+    inicio = fin_anterior = 0
+    for fin_nivel in inicios_nivel[1:] + [len(tabla)]:
+        # Si el Nivel siguiente no cabe se cierra la página en el Nivel anterior
+        if fin_nivel - inicio > filas_por_pagina and fin_anterior > inicio:
+            paginas.append((etiqueta(inicio, fin_anterior), inicio, fin_anterior))
+            inicio = fin_anterior
+        fin_anterior = fin_nivel
+    paginas.append((etiqueta(inicio, len(tabla)), inicio, len(tabla)))
+    return paginas
+
 def crear_tabla_interactiva(df, titulo, columna_volumen="VolumenHA", tab_key=""):
     """Crea una tabla interactiva con AgGrid, jerarquía expandible por Nivel y Elementos como matriz, mostrando solo el valor correspondiente (VolumenHA, AreaMoldaje o Cuantia) según el tipo de tabla. El resumen general muestra solo el total correspondiente y el % de avance real (Si/Total*100 en avance, no en conteo). La columna Total está oculta en la tabla pero se usa para los cálculos y el resumen."""
-    from st_aggrid import AgGrid, GridOptionsBuilder, GridUpdateMode, DataReturnMode
+    from st_aggrid import AgGrid, GridUpdateMode, DataReturnMode
 
     if df.empty:
         return
@@ -330,36 +417,11 @@ def crear_tabla_interactiva(df, titulo, columna_volumen="VolumenHA", tab_key="")
     if missing_columns:
         return
 
-    # Filtrar filas válidas
-    df_filtrado = df[df["Nivel"].notna() & (df["Nivel"].astype(str).str.strip() != "")]
-    df_filtrado = df_filtrado[df_filtrado["Elementos"].notna() & (df_filtrado["Elementos"].astype(str).str.strip() != "")]
-    df_filtrado = df_filtrado[df_filtrado[valor_col].notna() & (df_filtrado[valor_col].astype(str).str.strip() != "")]
-    if df_filtrado.empty:
+    # Tabla Si/No/Total de la métrica, tomada del cubo compartido por las tres tablas
+    resumen = obtener_resumenes_avance(df).get(valor_col)
+    if resumen is None:
         return
 
-    # Normalizar valores del parámetro booleano
-    df_filtrado[param_bool] = df_filtrado[param_bool].astype(str).str.strip().str.lower()
-    # Considerar 'sí' como positivo, el resto como 'no'
-    df_filtrado["Es_Si"] = np.where(df_filtrado[param_bool].isin(["si", "sí", "true", "1"]), 1, 0)
-    df_filtrado["Es_No"] = 1 - df_filtrado["Es_Si"]
-    df_filtrado[valor_col] = df_filtrado[valor_col].astype(float)
-
-    # Calcular avance real para Si y No
-    df_filtrado["Avance_Si"] = np.where(df_filtrado["Es_Si"] == 1, df_filtrado[valor_col], 0)
-    df_filtrado["Avance_No"] = np.where(df_filtrado["Es_No"] == 1, df_filtrado[valor_col], 0)
-
-    # Agrupar por Nivel y Elementos
-    resumen = df_filtrado.groupby(["Nivel", "Elementos"]).agg(
-        Si=("Avance_Si", "sum"),
-        No=("Avance_No", "sum"),
-        Total=(valor_col, "sum")
-    ).reset_index()
-    resumen["Si%"] = np.where(resumen["Total"] > 0, (resumen["Si"] / resumen["Total"] * 100).round(2), 0)
-    resumen["No%"] = np.where(resumen["Total"] > 0, (resumen["No"] / resumen["Total"] * 100).round(2), 0)
-    resumen[valor_col] = resumen["Total"].round(2)
-    resumen["Si"] = resumen["Si"].round(2)
-    resumen["No"] = resumen["No"].round(2)
-
     st.subheader(titulo)
 
     # Filtros
@@ -371,196 +433,193 @@ def crear_tabla_interactiva(df, titulo, columna_volumen="VolumenHA", tab_key="")
         elementos = ["Todos"] + sorted(resumen["Elementos"].unique())
         elemento_seleccionado = st.selectbox("Filtrar por Elemento:", elementos, key=f"elemento_{tab_key}")
 
-    df_filtrado_tabla = resumen.copy()
-    if nivel_seleccionado != "Todos":
-        df_filtrado_tabla = df_filtrado_tabla[df_filtrado_tabla["Nivel"] == nivel_seleccionado]
-    if elemento_seleccionado != "Todos":
-        df_filtrado_tabla = df_filtrado_tabla[df_filtrado_tabla["Elementos"] == elemento_seleccionado]
-
-    # Configurar AgGrid para jerarquía expandible y columnas visibles
-    gb = GridOptionsBuilder.from_dataframe(df_filtrado_tabla)
-    gb.configure_default_column(resizable=True, filterable=True, sortable=True, editable=False)
-    gb.configure_column("Nivel", rowGroup=True, rowGroupIndex=0)  # visible
-    gb.configure_column("Elementos", rowGroup=True, rowGroupIndex=1)  # visible
-    gb.configure_column("Si", type=["numericColumn", "numberColumnFilter"], width=100, valueFormatter="value.toFixed(2)")
-    gb.configure_column("Si%", type=["numericColumn", "numberColumnFilter"], width=100, valueFormatter="value.toFixed(2) + '%'", cellStyle={"color": "green"})
-    gb.configure_column("No", type=["numericColumn", "numberColumnFilter"], width=100, valueFormatter="value.toFixed(2)")
-    gb.configure_column("No%", type=["numericColumn", "numberColumnFilter"], width=100, valueFormatter="value.toFixed(2) + '%'", cellStyle={"color": "red"})
-    gb.configure_column("Total", type=["numericColumn", "numberColumnFilter"], width=120, valueFormatter="value.toFixed(2)", hide=True)
-    gb.configure_column(valor_col, type=["numericColumn", "numberColumnFilter"], width=120, valueFormatter="value.toFixed(2)")
-    gb.configure_grid_options(
-        domLayout='normal',
-        enableRangeSelection=True,
-        enableCharts=True,
-        groupDisplayType='groupRows',
-        groupDefaultExpanded=0  # Colapsado por defecto
-    )
-    grid_options = gb.build()
-
-    AgGrid(
-        df_filtrado_tabla,
-        gridOptions=grid_options,
-        data_return_mode=DataReturnMode.FILTERED_AND_SORTED,
-        update_mode=GridUpdateMode.GRID_CHANGED,
-        fit_columns_on_grid_load=True,
-        theme='streamlit',
-        height=400,
-        allow_unsafe_jscode=True
+    # Tabla filtrada, totales y configuración de la grilla (memoizados por filtro)
+    vista = obtener_vista(
+        df.attrs.get("version"), f"avance_{valor_col}", nivel_seleccionado, elemento_seleccionado,
+        lambda: _calcular_vista_avance(resumen, valor_col, nivel_seleccionado, elemento_seleccionado)
     )
+    df_filtrado_tabla = vista["tabla"]
+    totales = vista["totales"]
+    grid_options = vista["grid_options"]
+    paginas = vista["paginas"]
+
+    # En tablas grandes solo se envía a la grilla la página de Niveles elegida
+    pagina = 0
+    if len(paginas) > 1:
+        pagina = st.selectbox(
+            f"Página ({len(paginas)} páginas, {len(df_filtrado_tabla):,} filas):",
+            range(len(paginas)),
+            format_func=lambda i: paginas[i][0],
+            key=f"pagina_{tab_key}_{nivel_seleccionado}_{elemento_seleccionado}"
+        )
+    _, inicio, fin = paginas[pagina]
+
+    # La grilla no devuelve datos a Python: filtrar, ordenar o expandir grupos
+    # se resuelve en el navegador sin provocar un rerun
+    with tramo("render.aggrid"):
+        AgGrid(
+            df_filtrado_tabla.iloc[inicio:fin],
+            gridOptions=grid_options,
+            data_return_mode=DataReturnMode.AS_INPUT,
+            update_mode=GridUpdateMode.NO_UPDATE,
+            update_on=[],
+            fit_columns_on_grid_load=True,
+            theme='streamlit',
+            height=400,
+            allow_unsafe_jscode=True,
+            key=f"grilla_{tab_key}"
+        )
 
     # Métricas generales
     if not df_filtrado_tabla.empty:
         st.subheader("📊 Resumen General")
         cols = st.columns(5)
         with cols[0]:
-            st.metric("Total Avance", f"{df_filtrado_tabla['Total'].sum():.2f}")
+            st.metric("Total Avance", f"{totales['Total']:.2f}")
         with cols[1]:
-            st.metric(f"Avance {valor_label} (Sí)", f"{df_filtrado_tabla['Si'].sum():.2f}")
+            st.metric(f"Avance {valor_label} (Sí)", f"{totales['Si']:.2f}")
         with cols[2]:
-            st.metric(f"Avance {valor_label} (No)", f"{df_filtrado_tabla['No'].sum():.2f}")
+            st.metric(f"Avance {valor_label} (No)", f"{totales['No']:.2f}")
         with cols[3]:
-            st.metric(valor_label, f"{df_filtrado_tabla[valor_col].sum():.2f}")
+            st.metric(valor_label, f"{totales[valor_col]:.2f}")
         with cols[4]:
-            total = df_filtrado_tabla["Total"].sum()
-            si = df_filtrado_tabla["Si"].sum()
+            total = totales["Total"]
+            si = totales["Si"]
             if total > 0:
                 st.metric("% Avance", f"{(si/total*100):.2f}%")
             else:
                 st.metric("% Avance", "0.00%")
 
-def mostrar_avance_semanal(use_local_files=False):
-    """Muestra el avance semanal de hormigones"""
-    if use_local_files:
-        archivos_fechas, service = cargar_archivos_semanales_local()
-    else:
-        archivos_fechas, service = cargar_archivos_semanales()
-    
-    if not archivos_fechas:
-        st.info("No se encontraron archivos semanales para mostrar. Verifica que existan archivos en la carpeta 'REPORTE SEMANAL' o en Google Drive.")
-        return
-    
-    # Procesar archivos
-    lista_df = []
-    archivos_procesados = 0
-    
+def _unir_dataset_semanal(version, resumenes):
+    """Dataset semanal unido, cacheado en el proyecto por versión del conjunto de archivos"""
+    return memo(proyecto_actual(), ("semanal", version), lambda: unir_resumenes_semanales(resumenes))
+
+def identificar_archivos_semanales(archivos_fechas, use_local_files=False):
+    """Convierte (archivo, fecha) en (file_id, modifiedTime, fecha), que identifican cada versión"""
+    archivos = []
     for f, fecha in archivos_fechas:
         try:
             if use_local_files:
                 # Para archivos locales, f es el nombre del archivo
                 filepath = os.path.join("REPORTE SEMANAL", f)
-                fh = leer_archivo_local(filepath)
+                archivos.append((filepath, firma_archivo(filepath), fecha))
             else:
                 # Para archivos de Google Drive, f es el objeto del archivo
-                fh = download_file(service, f['id'])
-            
-            if not fh:
-                continue
-                
-            # Leer el archivo con el formato correcto
-            dfw = pd.read_csv(fh, sep='\t', header=1, dtype=str, quoting=3)  # QUOTE_NONE
-            dfw = dfw.dropna(how="all")
-            
-            if dfw.empty:
-                continue
-            
-            # Limpiar columnas (remover comillas)
-            dfw = dfw.rename(columns=lambda x: x.strip().replace('"', '') if isinstance(x, str) else x)
-            
-            # Limpiar datos (remover comillas de los valores)
-            for col in dfw.columns:
-                if dfw[col].dtype == 'object':
-                    dfw[col] = dfw[col].astype(str).str.replace('"', '')
-            
-            # Verificar que exista la columna VolumenHA
-            if "VolumenHA" not in dfw.columns:
-                continue
-            
-            # Convertir VolumenHA a numérico
-            dfw["VolumenHA"] = pd.to_numeric(
-                dfw["VolumenHA"].str.replace(",", ".", regex=False), 
-                errors='coerce'
-            )
-            
-            # Solo Hormigonado = 'Sí'
-            if "Hormigonado" in dfw.columns:
-                dfw = dfw[dfw["Hormigonado"] == "Sí"]
-            else:
-                continue
-            
-            # Solo filas con Nivel y Elementos válidos
-            if "Nivel" in dfw.columns and "Elementos" in dfw.columns:
-                dfw = dfw[dfw["Nivel"].notna() & (dfw["Nivel"].astype(str).str.strip() != "")]
-                dfw = dfw[dfw["Elementos"].notna() & (dfw["Elementos"].astype(str).str.strip() != "")]
-            else:
-                continue
-            
-            # Solo filas con VolumenHA válido
-            dfw = dfw[dfw["VolumenHA"].notna() & (dfw["VolumenHA"] > 0)]
-            
-            if dfw.empty:
-                continue
-            
-            # Agrupar por Nivel y Elementos
-            resumen = dfw.groupby(["Nivel", "Elementos"])["VolumenHA"].sum().reset_index()
-            resumen["Fecha"] = fecha
-            lista_df.append(resumen)
-            archivos_procesados += 1
-            
+                archivos.append((f['id'], f.get('modifiedTime'), fecha))
         except Exception as e:
             continue
+    return archivos
+
+def obtener_dataset_semanal(archivos_fechas, service, use_local_files=False):
+    """Obtiene el dataset semanal compartido por las vistas semanal y trisemanal y su versión.
+
+    El dataset tiene VolumenHA por (Nivel, Elementos, FC_CON_TRISEMANAL, Fecha).
+    """
+    archivos = identificar_archivos_semanales(archivos_fechas, use_local_files)
     
-    if not lista_df:
-        st.info("No se pudieron procesar archivos semanales. Verifica el formato de los archivos.")
+    # Si el actualizador ya preparó esta versión se usa directamente
+    if service is not None and not use_local_files:
+        version = version_archivos(archivos)
+        dataset = obtener_publicado(f"semanal:{proyecto_actual()}", version=version)
+        if dataset is not None:
+            return memo(proyecto_actual(), ("semanal", version), lambda: dataset), version
+    
+    try:
+        resumenes = cargar_resumenes_semanales(
+            archivos,
+            service=service,
+            creds=get_drive_credentials() if service is not None else None,
+            max_concurrentes=int(leer_config("MAX_DESCARGAS_CONCURRENTES", MAX_DESCARGAS_CONCURRENTES)),
+            procesos=int(leer_config("PROCESOS_LECTURA", PROCESOS_LECTURA))
+        )
+    except Exception as e:
+        return None, None
+    
+    # Los archivos leídos identifican la versión de los datos semanales
+    leidos = {fecha for fecha, _ in resumenes}
+    version = version_archivos([a for a in archivos if a[2] in leidos])
+    return _unir_dataset_semanal(version, resumenes), version
+
+def _totales_fechas(tabla, fechas):
+    """Totales de la tabla filtrada: Total, primera y última semana"""
+    totales = {}
+    if "Total" in tabla.columns:
+        totales["Total"] = tabla["Total"].sum()
+    if len(fechas) >= 2:
+        if fechas[-1] in tabla.columns:
+            totales["ultima"] = tabla[fechas[-1]].sum()
+        if fechas[0] in tabla.columns:
+            totales["primera"] = tabla[fechas[0]].sum()
+    return totales
+
+def _etiqueta_columna(col):
+    """Encabezado de una columna de las tablas semanales (las fechas como dd/mm/aaaa).
+
+    column_config solo acepta claves de texto, así que las columnas de fecha se
+    configuran por su nombre convertido a texto.
+    """
+    if isinstance(col, pd.Timestamp):
+        return col.strftime("%d/%m/%Y")
+    return str(col)
+
+def _calcular_vista_semanal(pivot_semanal, fechas, nivel, elemento, ultimas):
+    """Tabla filtrada, tabla visible (últimas semanas), configuración de columnas y totales del avance semanal"""
+    df_filtrado_tabla = filtrar_nivel_elemento(pivot_semanal, nivel, elemento)
+    
+    # Solo se envían al navegador las últimas semanas, en float32
+    df_to_show = tabla_para_mostrar(ventana_semanal(df_filtrado_tabla, fechas, ultimas))
+    
+    # Crear configuración de columnas dinámica
+    column_config = {
+        "Nivel": st.column_config.TextColumn("Nivel", width="medium"),
+        "Elementos": st.column_config.TextColumn("Elementos", width="large"),
+    }
+    
+    # Agregar columnas de fechas
+    for col in df_to_show.columns:
+        if col not in ["Nivel", "Elementos", "Total", "% Avance"]:
+            column_config[str(col)] = st.column_config.NumberColumn(_etiqueta_columna(col), format="%.2f")
+    
+    # Agregar columnas de totales
+    if "Total" in df_filtrado_tabla.columns:
+        column_config["Total"] = st.column_config.NumberColumn("Total", format="%.2f")
+    if "% Avance" in df_filtrado_tabla.columns:
+        column_config["% Avance"] = st.column_config.NumberColumn("% Avance", format="%.2f%%")
+    
+    return {
+        "tabla": df_filtrado_tabla,
+        "tabla_visible": df_to_show,
+        "column_config": column_config,
+        "totales": _totales_fechas(df_filtrado_tabla, fechas)
+    }
+
+def mostrar_avance_semanal(use_local_files=False):
+    """Muestra el avance semanal de hormigones"""
+    if use_local_files:
+        archivos_fechas, service = cargar_archivos_semanales_local()
+    else:
+        archivos_fechas, service = cargar_archivos_semanales(proyecto_configurado()["folder_id"]) or ([], None)
+    
+    if not archivos_fechas:
+        st.info("No se encontraron archivos semanales para mostrar. Verifica que existan archivos en la carpeta 'REPORTE SEMANAL' o en Google Drive.")
         return
     
-    if archivos_procesados == 0:
-        st.info("No se encontraron datos válidos en los archivos semanales.")
+    # Procesar archivos (solo se descargan los archivos nuevos o modificados)
+    dataset, version = obtener_dataset_semanal(archivos_fechas, service, use_local_files)
+    
+    if dataset is None or dataset.empty:
+        st.info("No se pudieron procesar archivos semanales. Verifica el formato de los archivos.")
         return
     
-    # Unir todos los resultados
-    df_semana = pd.concat(lista_df, ignore_index=True)
+    # Sumar todas las semanas trisemanales de cada archivo
+    df_semana = obtener_agregado(version, "avance_semanal", lambda: avance_semanal(dataset))
+    archivos_procesados = df_semana["Fecha"].nunique()
     
     if df_semana.empty:
         st.info("No hay datos de hormigones para mostrar.")
         return
     
-    # Crear tabla pivot para comparación
-    try:
-        pivot_semanal = df_semana.pivot_table(
-            values="VolumenHA",
-            index=["Nivel", "Elementos"],
-            columns="Fecha",
-            aggfunc="sum",
-            fill_value=0
-        ).reset_index()
-    except Exception as e:
-        st.info("Error al crear la tabla de comparación semanal.")
-        return
-    
-    # Calcular diferencias entre semanas
     fechas = sorted(df_semana["Fecha"].unique())
-    if len(fechas) >= 2:
-        for i in range(1, len(fechas)):
-            col_actual = fechas[i]
-            col_anterior = fechas[i-1]
-            if col_actual in pivot_semanal.columns and col_anterior in pivot_semanal.columns:
-                pivot_semanal[f"Dif_{col_anterior.strftime('%d/%m')}_{col_actual.strftime('%d/%m')}"] = (
-                    pivot_semanal[col_actual] - pivot_semanal[col_anterior]
-                )
-    
-    # Calcular totales
-    numeric_cols = pivot_semanal.select_dtypes(include=[np.number]).columns
-    if len(numeric_cols) > 0:
-        pivot_semanal["Total"] = pivot_semanal[numeric_cols].sum(axis=1)
-        if pivot_semanal["Total"].sum() > 0:
-            pivot_semanal["% Avance"] = (pivot_semanal["Total"] / pivot_semanal["Total"].sum() * 100).round(2)
-    
-    # Formatear columnas numéricas
-    for col in pivot_semanal.select_dtypes(include=[np.number]).columns:
-        pivot_semanal[col] = pivot_semanal[col].round(2)
-    
-    # Ordenar por Nivel y Elemento para jerarquía visual
-    pivot_semanal = pivot_semanal.sort_values(["Nivel", "Elementos"]).reset_index(drop=True)
     
     # Mostrar tabla
     st.subheader("Avance Semanal Hormigones")
@@ -589,46 +648,45 @@ def mostrar_avance_semanal(use_local_files=False):
         except Exception as e:
             elemento_seleccionado = "Todos"
     
-    # Aplicar filtros
-    df_filtrado_tabla = pivot_semanal.copy()
+    # Semanas que se muestran; las anteriores se agrupan en una columna acumulada
+    ultimas = len(fechas)
+    if len(fechas) > 1:
+        try:
+            por_defecto = min(int(leer_config("SEMANAS_VISIBLES", SEMANAS_VISIBLES)), len(fechas))
+            ultimas = int(st.number_input(
+                "Semanas visibles:", min_value=1, max_value=len(fechas), value=por_defecto, key="semanal_ventana"
+            ))
+        except Exception as e:
+            ultimas = len(fechas)
+    
+    # Tabla pivot filtrada, configuración de columnas y totales (memoizados por filtro)
     try:
-        if nivel_seleccionado != "Todos":
-            df_filtrado_tabla = df_filtrado_tabla[df_filtrado_tabla["Nivel"] == nivel_seleccionado]
-        if elemento_seleccionado != "Todos":
-            df_filtrado_tabla = df_filtrado_tabla[df_filtrado_tabla["Elementos"] == elemento_seleccionado]
+        vista = obtener_vista(
+            version, f"semanal_{ultimas}", nivel_seleccionado, elemento_seleccionado,
+            lambda: _calcular_vista_semanal(
+                obtener_agregado(version, "pivot_semanal", lambda: construir_pivot_semanal(df_semana, fechas)),
+                fechas, nivel_seleccionado, elemento_seleccionado, ultimas
+            )
+        )
     except Exception as e:
-        pass
+        st.info("Error al crear la tabla de comparación semanal.")
+        return
+    df_filtrado_tabla = vista["tabla"]
+    totales = vista["totales"]
+    
+    if ultimas < len(fechas):
+        st.caption(f"Semanas hasta el {fechas[-ultimas - 1].strftime('%d/%m/%Y')} agrupadas en la columna acumulada")
     
     # Mostrar tabla con jerarquías expandibles
     try:
-        # Crear configuración de columnas dinámica
-        column_config = {
-            "Nivel": st.column_config.TextColumn("Nivel", width="medium"),
-            "Elementos": st.column_config.TextColumn("Elementos", width="large"),
-        }
-        
-        # Agregar columnas de fechas
-        for col in df_filtrado_tabla.columns:
-            if col not in ["Nivel", "Elementos", "Total", "% Avance"]:
-                if "Dif_" in col:
-                    column_config[col] = st.column_config.NumberColumn(col, format="%.2f")
-                else:
-                    column_config[col] = st.column_config.NumberColumn(col, format="%.2f")
-        
-        # Agregar columnas de totales
-        if "Total" in df_filtrado_tabla.columns:
-            column_config["Total"] = st.column_config.NumberColumn("Total", format="%.2f")
-        if "% Avance" in df_filtrado_tabla.columns:
-            column_config["% Avance"] = st.column_config.NumberColumn("% Avance", format="%.2f%%")
-        
         st.dataframe(
-            df_filtrado_tabla,
+            vista["tabla_visible"],
             use_container_width=True,
             hide_index=True,
-            column_config=column_config
+            column_config=vista["column_config"]
         )
     except Exception as e:
-        st.dataframe(df_filtrado_tabla, use_container_width=True)
+        st.dataframe(vista["tabla_visible"], use_container_width=True)
     
     # Mostrar métricas
     if not df_filtrado_tabla.empty and "Total" in df_filtrado_tabla.columns:
@@ -636,22 +694,15 @@ def mostrar_avance_semanal(use_local_files=False):
             col1, col2, col3 = st.columns(3)
             
             with col1:
-                total_sum = df_filtrado_tabla['Total'].sum()
-                st.metric("Total General", f"{total_sum:.2f}")
+                st.metric("Total General", f"{totales['Total']:.2f}")
             
             with col2:
-                if len(fechas) >= 2:
-                    ultima_fecha = fechas[-1]
-                    if ultima_fecha in df_filtrado_tabla.columns:
-                        ultimo_total = df_filtrado_tabla[ultima_fecha].sum()
-                        st.metric(f"Total {ultima_fecha.strftime('%d/%m/%Y')}", f"{ultimo_total:.2f}")
+                if "ultima" in totales:
+                    st.metric(f"Total {fechas[-1].strftime('%d/%m/%Y')}", f"{totales['ultima']:.2f}")
             
             with col3:
-                if len(fechas) >= 2:
-                    primera_fecha = fechas[0]
-                    if primera_fecha in df_filtrado_tabla.columns:
-                        primer_total = df_filtrado_tabla[primera_fecha].sum()
-                        st.metric(f"Total {primera_fecha.strftime('%d/%m/%Y')}", f"{primer_total:.2f}")
+                if "primera" in totales:
+                    st.metric(f"Total {fechas[0].strftime('%d/%m/%Y')}", f"{totales['primera']:.2f}")
                         
         except Exception as e:
             pass
@@ -660,150 +711,130 @@ def mostrar_avance_semanal(use_local_files=False):
     if len(fechas) >= 2:
         st.subheader("Tendencia Semanal")
         try:
-            df_tendencia = df_semana.groupby("Fecha")["VolumenHA"].sum().reset_index()
-            fig = px.line(df_tendencia, x="Fecha", y="VolumenHA", 
-                         title="Evolución del Volumen de Hormigón por Semana")
-            st.plotly_chart(fig, use_container_width=True)
+            mostrar_tendencia(version, df_semana, nivel_seleccionado, elemento_seleccionado)
         except Exception as e:
             st.info("No se pudo generar el gráfico de tendencia.")
 
+# Series del gráfico de tendencia: opción -> columna por la que se agrupa
+AGRUPAR_TENDENCIA = {"Total": None, "Nivel": "Nivel", "Elemento": "Elementos"}
+
+def obtener_tendencia(version, df_semana, agrupar, valores, nivel, elemento):
+    """Series reducidas del gráfico de tendencia, cacheadas en el proyecto con el dataset semanal.
+
+    Las series semanales y acumuladas de cada grupo se calculan una vez por
+    versión, agrupación y filtro; las que se envían al navegador tienen a lo
+    más PUNTOS_TENDENCIA puntos.
+    """
+    series = memo(
+        proyecto_actual(), ("tendencia", version, agrupar, nivel, elemento),
+        lambda: series_tendencia(filtrar_nivel_elemento(df_semana, nivel, elemento), AGRUPAR_TENDENCIA[agrupar])
+    )
+    puntos = int(leer_config("PUNTOS_TENDENCIA", PUNTOS_TENDENCIA))
+    return memo(
+        proyecto_actual(), ("tendencia.grafico", version, agrupar, valores, nivel, elemento, puntos),
+        lambda: series_para_grafico(series[valores], puntos)
+    )
+
+def mostrar_tendencia(version, df_semana, nivel, elemento):
+    """Gráfico de tendencia semanal o acumulada, total o con una serie por Nivel o Elemento"""
+    col1, col2 = st.columns(2)
+    with col1:
+        agrupar = st.selectbox("Series por:", list(AGRUPAR_TENDENCIA), key="tendencia_agrupar")
+    with col2:
+        valores = st.radio("Valores:", ["Semanal", "Acumulado"], horizontal=True, key="tendencia_valores")
+    
+    tendencia = obtener_tendencia(version, df_semana, agrupar, valores, nivel, elemento)
+    if tendencia.empty:
+        st.info("No hay datos para el gráfico de tendencia con los filtros seleccionados.")
+        return
+    
+    # plotly solo se carga cuando se muestra el gráfico
+    import plotly.graph_objects as go
+    with tramo("render.tendencia"):
+        # Scattergl dibuja con WebGL, que sigue fluido con muchas series y puntos
+        trazos = [
+            go.Scattergl(x=serie["Fecha"], y=serie["VolumenHA"], mode="lines", name=str(grupo))
+            for grupo, serie in tendencia.groupby("Grupo", sort=False, observed=True)
+        ]
+        titulo = "Evolución del Volumen de Hormigón por Semana" if valores == "Semanal" else "Volumen de Hormigón Acumulado"
+        fig = go.Figure(data=trazos)
+        fig.update_layout(
+            title=titulo, xaxis_title="Fecha", yaxis_title="VolumenHA",
+            showlegend=len(trazos) > 1, legend_title_text=agrupar
+        )
+        st.plotly_chart(fig, use_container_width=True)
+
+def _calcular_vista_trisemanal(pivot_trisemanal, fechas, nivel, elemento):
+    """Tabla filtrada, configuración de columnas y totales de la comparación trisemanal"""
+    df_filtrado_tabla = filtrar_nivel_elemento(pivot_trisemanal, nivel, elemento)
+    
+    # Crear configuración de columnas dinámica
+    column_config = {
+        "Nivel": st.column_config.TextColumn("Nivel", width="medium"),
+        "Elementos": st.column_config.TextColumn("Elementos", width="large"),
+    }
+    
+    # Agregar columnas de fechas
+    for col in df_filtrado_tabla.columns:
+        if col not in ["Nivel", "Elementos", "Total", "% Avance", "Diferencia"]:
+            column_config[str(col)] = st.column_config.NumberColumn(_etiqueta_columna(col), format="%.2f")
+    
+    # Agregar columnas especiales
+    if "Diferencia" in df_filtrado_tabla.columns:
+        column_config["Diferencia"] = st.column_config.NumberColumn("Diferencia", format="%.2f")
+    
+    # Ocultar columnas 'Total' y '% Avance' en la visualización
+    cols_to_hide = ["Total", "% Avance"]
+    df_to_show = tabla_para_mostrar(
+        df_filtrado_tabla.drop(columns=[col for col in cols_to_hide if col in df_filtrado_tabla.columns])
+    )
+    
+    totales = _totales_fechas(df_filtrado_tabla, fechas)
+    if "Diferencia" in df_filtrado_tabla.columns:
+        diferencia = df_filtrado_tabla["Diferencia"]
+        totales["Diferencia"] = diferencia.sum()
+        totales["positivas"] = diferencia[diferencia > 0].sum()
+        totales["negativas"] = diferencia[diferencia < 0].sum()
+    
+    return {
+        "tabla": df_filtrado_tabla,
+        "tabla_visible": df_to_show,
+        "column_config": column_config,
+        "totales": totales
+    }
+
 def mostrar_trisemanal(use_local_files=False):
     """Muestra comparación trisemanal"""
     if use_local_files:
         archivos_fechas, service = cargar_archivos_semanales_local()
     else:
-        archivos_fechas, service = cargar_archivos_semanales()
+        archivos_fechas, service = cargar_archivos_semanales(proyecto_configurado()["folder_id"]) or ([], None)
     
     if len(archivos_fechas) < 2:
         st.info("Se necesitan al menos 2 archivos semanales para la comparación trisemanal.")
         return
     
+    # Procesar archivos: se usa el mismo dataset que el avance semanal
+    dataset, version = obtener_dataset_semanal(archivos_fechas, service, use_local_files)
+    
     # Tomar solo los 2 últimos archivos
     archivos_fechas = archivos_fechas[-2:]
     
-    # Procesar archivos
-    lista_df = []
-    archivos_procesados = 0
-    
-    for f, fecha in archivos_fechas:
-        try:
-            if use_local_files:
-                # Para archivos locales, f es el nombre del archivo
-                filepath = os.path.join("REPORTE SEMANAL", f)
-                fh = leer_archivo_local(filepath)
-            else:
-                # Para archivos de Google Drive, f es el objeto del archivo
-                fh = download_file(service, f['id'])
-            
-            if not fh:
-                continue
-                
-            # Leer el archivo con el formato correcto
-            dfw = pd.read_csv(fh, sep='\t', header=1, dtype=str, quoting=3)  # QUOTE_NONE
-            dfw = dfw.dropna(how="all")
-            
-            if dfw.empty:
-                continue
-            
-            # Limpiar columnas (remover comillas)
-            dfw = dfw.rename(columns=lambda x: x.strip().replace('"', '') if isinstance(x, str) else x)
-            
-            # Limpiar datos (remover comillas de los valores)
-            for col in dfw.columns:
-                if dfw[col].dtype == 'object':
-                    dfw[col] = dfw[col].astype(str).str.replace('"', '')
-            
-            # Verificar que exista la columna VolumenHA
-            if "VolumenHA" not in dfw.columns:
-                continue
-            
-            # Convertir VolumenHA a numérico
-            dfw["VolumenHA"] = pd.to_numeric(
-                dfw["VolumenHA"].str.replace(",", ".", regex=False), 
-                errors='coerce'
-            )
-            
-            # Solo Hormigonado = 'Sí'
-            if "Hormigonado" in dfw.columns:
-                dfw = dfw[dfw["Hormigonado"] == "Sí"]
-            else:
-                continue
-            
-            # Solo filas con Nivel y Elementos válidos
-            if "Nivel" in dfw.columns and "Elementos" in dfw.columns:
-                dfw = dfw[dfw["Nivel"].notna() & (dfw["Nivel"].astype(str).str.strip() != "")]
-                dfw = dfw[dfw["Elementos"].notna() & (dfw["Elementos"].astype(str).str.strip() != "")]
-            else:
-                continue
-            
-            # Solo filas con VolumenHA válido
-            dfw = dfw[dfw["VolumenHA"].notna() & (dfw["VolumenHA"] > 0)]
-            
-            # Filtrar por FC_CON_TRISEMANAL = 'Semana 01' por defecto
-            if "FC_CON_TRISEMANAL" in dfw.columns:
-                dfw = dfw[dfw["FC_CON_TRISEMANAL"] == "Semana 01"]
-            
-            if dfw.empty:
-                continue
-            
-            # Agrupar por Nivel y Elementos
-            resumen = dfw.groupby(["Nivel", "Elementos"])["VolumenHA"].sum().reset_index()
-            resumen["Fecha"] = fecha
-            lista_df.append(resumen)
-            archivos_procesados += 1
-            
-        except Exception as e:
-            continue
-    
-    if not lista_df:
+    if dataset is None or dataset.empty:
         st.info("No se pudieron procesar archivos para la comparación trisemanal.")
         return
     
+    # Filtrar por FC_CON_TRISEMANAL = 'Semana 01' por defecto
+    df_semana = obtener_agregado(
+        version, "avance_trisemanal", lambda: avance_trisemanal(dataset, [fecha for _, fecha in archivos_fechas])
+    )
+    archivos_procesados = df_semana["Fecha"].nunique()
+    
     if archivos_procesados < 2:
         st.info("Se necesitan al menos 2 archivos válidos para la comparación trisemanal.")
         return
     
-    # Unir todos los resultados
-    df_semana = pd.concat(lista_df, ignore_index=True)
-    
-    if df_semana.empty:
-        st.info("No hay datos para la comparación trisemanal.")
-        return
-    
-    # Crear tabla pivot para comparación
-    try:
-        pivot_trisemanal = df_semana.pivot_table(
-            values="VolumenHA",
-            index=["Nivel", "Elementos"],
-            columns="Fecha",
-            aggfunc="sum",
-            fill_value=0
-        ).reset_index()
-    except Exception as e:
-        st.info("Error al crear la tabla de comparación trisemanal.")
-        return
-    
-    # Calcular diferencia entre las dos semanas
     fechas = sorted(df_semana["Fecha"].unique())
-    if len(fechas) == 2:
-        col_actual = fechas[1]
-        col_anterior = fechas[0]
-        if col_actual in pivot_trisemanal.columns and col_anterior in pivot_trisemanal.columns:
-            pivot_trisemanal["Diferencia"] = pivot_trisemanal[col_actual] - pivot_trisemanal[col_anterior]
-    
-    # Calcular totales
-    numeric_cols = pivot_trisemanal.select_dtypes(include=[np.number]).columns
-    if len(numeric_cols) > 0:
-        pivot_trisemanal["Total"] = pivot_trisemanal[numeric_cols].sum(axis=1)
-        if pivot_trisemanal["Total"].sum() > 0:
-            pivot_trisemanal["% Avance"] = (pivot_trisemanal["Total"] / pivot_trisemanal["Total"].sum() * 100).round(2)
-    
-    # Formatear columnas numéricas
-    for col in pivot_trisemanal.select_dtypes(include=[np.number]).columns:
-        pivot_trisemanal[col] = pivot_trisemanal[col].round(2)
-    
-    # Ordenar por Nivel y Elemento para jerarquía visual
-    pivot_trisemanal = pivot_trisemanal.sort_values(["Nivel", "Elementos"]).reset_index(drop=True)
     
     # Mostrar tabla
     st.subheader("Comparación Trisemanal")
@@ -832,46 +863,31 @@ def mostrar_trisemanal(use_local_files=False):
         except Exception as e:
             elemento_seleccionado = "Todos"
     
-    # Aplicar filtros
-    df_filtrado_tabla = pivot_trisemanal.copy()
+    # Tabla pivot filtrada, configuración de columnas y totales (memoizados por filtro)
     try:
-        if nivel_seleccionado != "Todos":
-            df_filtrado_tabla = df_filtrado_tabla[df_filtrado_tabla["Nivel"] == nivel_seleccionado]
-        if elemento_seleccionado != "Todos":
-            df_filtrado_tabla = df_filtrado_tabla[df_filtrado_tabla["Elementos"] == elemento_seleccionado]
+        vista = obtener_vista(
+            version, "trisemanal", nivel_seleccionado, elemento_seleccionado,
+            lambda: _calcular_vista_trisemanal(
+                obtener_agregado(version, "pivot_trisemanal", lambda: construir_pivot_trisemanal(df_semana, fechas)),
+                fechas, nivel_seleccionado, elemento_seleccionado
+            )
+        )
     except Exception as e:
-        pass
+        st.info("Error al crear la tabla de comparación trisemanal.")
+        return
+    df_filtrado_tabla = vista["tabla"]
+    totales = vista["totales"]
     
     # Mostrar tabla con jerarquías expandibles
     try:
-        # Crear configuración de columnas dinámica
-        column_config = {
-            "Nivel": st.column_config.TextColumn("Nivel", width="medium"),
-            "Elementos": st.column_config.TextColumn("Elementos", width="large"),
-        }
-        
-        # Agregar columnas de fechas
-        for col in df_filtrado_tabla.columns:
-            if col not in ["Nivel", "Elementos", "Total", "% Avance", "Diferencia"]:
-                column_config[col] = st.column_config.NumberColumn(col, format="%.2f")
-        
-        # Agregar columnas especiales
-        if "Diferencia" in df_filtrado_tabla.columns:
-            column_config["Diferencia"] = st.column_config.NumberColumn("Diferencia", format="%.2f")
-        # No agregar Total ni % Avance a column_config ni mostrarlas
-        
-        # Ocultar columnas 'Total' y '% Avance' en la visualización
-        cols_to_hide = ["Total", "% Avance"]
-        df_to_show = df_filtrado_tabla.drop(columns=[col for col in cols_to_hide if col in df_filtrado_tabla.columns])
-        
         st.dataframe(
-            df_to_show,
+            vista["tabla_visible"],
             use_container_width=True,
             hide_index=True,
-            column_config=column_config
+            column_config=vista["column_config"]
         )
     except Exception as e:
-        st.dataframe(df_filtrado_tabla, use_container_width=True)
+        st.dataframe(vista["tabla_visible"], use_container_width=True)
     
     # Mostrar resumen de diferencias
     if "Diferencia" in df_filtrado_tabla.columns:
@@ -879,15 +895,13 @@ def mostrar_trisemanal(use_local_files=False):
         col1, col2, col3 = st.columns(3)
         
         with col1:
-            st.metric("Diferencia Total", f"{df_filtrado_tabla['Diferencia'].sum():.2f}")
+            st.metric("Diferencia Total", f"{totales['Diferencia']:.2f}")
         
         with col2:
-            positivas = df_filtrado_tabla[df_filtrado_tabla['Diferencia'] > 0]['Diferencia'].sum()
-            st.metric("Diferencias Positivas", f"{positivas:.2f}")
+            st.metric("Diferencias Positivas", f"{totales['positivas']:.2f}")
         
         with col3:
-            negativas = df_filtrado_tabla[df_filtrado_tabla['Diferencia'] < 0]['Diferencia'].sum()
-            st.metric("Diferencias Negativas", f"{negativas:.2f}")
+            st.metric("Diferencias Negativas", f"{totales['negativas']:.2f}")
     
     # Mostrar métricas adicionales
     if not df_filtrado_tabla.empty and "Total" in df_filtrado_tabla.columns:
@@ -895,51 +909,30 @@ def mostrar_trisemanal(use_local_files=False):
             col1, col2, col3 = st.columns(3)
             
             with col1:
-                total_sum = df_filtrado_tabla['Total'].sum()
-                st.metric("Total General", f"{total_sum:.2f}")
+                st.metric("Total General", f"{totales['Total']:.2f}")
             
             with col2:
-                if len(fechas) >= 2:
-                    ultima_fecha = fechas[-1]
-                    if ultima_fecha in df_filtrado_tabla.columns:
-                        ultimo_total = df_filtrado_tabla[ultima_fecha].sum()
-                        st.metric(f"Total {ultima_fecha.strftime('%d/%m/%Y')}", f"{ultimo_total:.2f}")
+                if "ultima" in totales:
+                    st.metric(f"Total {fechas[-1].strftime('%d/%m/%Y')}", f"{totales['ultima']:.2f}")
             
             with col3:
-                if len(fechas) >= 2:
-                    primera_fecha = fechas[0]
-                    if primera_fecha in df_filtrado_tabla.columns:
-                        primer_total = df_filtrado_tabla[primera_fecha].sum()
-                        st.metric(f"Total {primera_fecha.strftime('%d/%m/%Y')}", f"{primer_total:.2f}")
+                if "primera" in totales:
+                    st.metric(f"Total {fechas[0].strftime('%d/%m/%Y')}", f"{totales['primera']:.2f}")
                         
         except Exception as e:
             pass
 
-@st.cache_data(ttl=3600)  # Cache por 1 hora
 def cargar_datos_local():
-    """Carga el archivo AO_GENERAL.txt desde archivo local"""
+    """Carga el archivo AO_GENERAL.txt desde archivo local; solo se relee si cambió.
+
+    Como los datos de Drive, el DataFrame se guarda una vez en el cache de
+    proyectos y todas las sesiones reciben el mismo objeto, sin copiarlo.
+    """
     try:
         local_file = "AO_GENERAL.txt"
         if os.path.exists(local_file):
-            df = pd.read_csv(local_file, sep="\t", header=1, dtype=str)
-            df = df.dropna(how="all")
-            
-            # Limpiar columnas
-            df = df.rename(columns=lambda x: x.strip().replace('"', ''))
-            
-            # Convertir tipos de datos
-            for col in ["VolumenHA", "AreaMoldaje", "Cuantia"]:
-                if col in df.columns:
-                    df[col] = pd.to_numeric(df[col].str.replace(",", ".", regex=False), errors='coerce')
-            
-            if "FC_CON_FECHA EJECUCION" in df.columns:
-                df["FC_CON_FECHA EJECUCION"] = pd.to_datetime(
-                    df["FC_CON_FECHA EJECUCION"], 
-                    dayfirst=True, 
-                    errors='coerce'
-                )
-            
-            return df
+            firma = firma_archivo(local_file)
+            return memo(PROYECTO_LOCAL, ("general", firma), lambda: cargar_ao_general_local(local_file, firma))
         else:
             return None
     except Exception as e:
@@ -997,18 +990,9 @@ def cargar_archivos_semanales_local():
     except Exception as e:
         return [], None
 
-def leer_archivo_local(filepath):
-    """Lee directamente un archivo local"""
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
-        from io import StringIO
-        return StringIO(content)
-    except Exception as e:
-        return None
-
 # Función principal
 def main():
+    fijar_presupuesto(int(leer_config("PRESUPUESTO_MEMORIA_MB", PRESUPUESTO_MEMORIA_MB)))
     st.markdown("# DASHBOARD CONTROL AVANCE OBRA GRUESA Y TERMINACIONES")
     st.sidebar.header("Menú Principal")
     if 'menu_seleccionado' not in st.session_state:
@@ -1052,8 +1036,18 @@ def main():
             help="Marca esta opción si quieres usar archivos locales en lugar de Google Drive"
         )
         if use_local_files:
+            st.session_state["proyecto_activo"] = PROYECTO_LOCAL
             df = cargar_datos_local()
         else:
+            proyectos = proyectos_configurados()
+            if len(proyectos) > 1:
+                st.session_state["proyecto_activo"] = st.sidebar.selectbox(
+                    "Proyecto", list(proyectos), format_func=lambda clave: proyectos[clave]["nombre"],
+                    key="selector_proyecto"
+                )
+            else:
+                st.session_state["proyecto_activo"] = next(iter(proyectos))
+            iniciar_actualizador()
             df = cargar_datos()
         if df is None:
             return
@@ -1074,6 +1068,69 @@ def main():
         st.title(f"Arquitectura - {submenu_arq}")
         # Placeholder vacío para futuras vistas
 
+def mostrar_diagnostico():
+    """Panel lateral con tiempos por tramo, aciertos de cache y bytes descargados de las últimas ejecuciones"""
+    with st.sidebar.expander("🔧 Diagnóstico", expanded=False):
+        recientes = ejecuciones_recientes()
+        if not recientes:
+            st.caption("Sin ejecuciones registradas.")
+            return
+        
+        ultima = recientes[0]
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("Última ejecución (s)", f"{ultima['segundos']:.3f}")
+        with col2:
+            st.metric("Descargado (KB)", f"{ultima['bytes_descargados'] / 1024:,.0f}")
+        
+        if ultima["tramos"]:
+            st.caption("Tramos de la última ejecución")
+            tramos = pd.DataFrame([
+                {"Tramo": nombre, "Llamadas": datos["n"], "Segundos": datos["segundos"]}
+                for nombre, datos in ultima["tramos"].items()
+            ]).sort_values("Segundos", ascending=False)
+            st.dataframe(tramos, hide_index=True, use_container_width=True)
+        
+        if ultima["cache"]:
+            st.caption("Cache de la última ejecución")
+            cache = pd.DataFrame([
+                {"Función": nombre, "Aciertos": datos["aciertos"], "Fallos": datos["fallos"]}
+                for nombre, datos in ultima["cache"].items()
+            ])
+            st.dataframe(cache, hide_index=True, use_container_width=True)
+        
+        st.caption(f"Últimas {len(recientes)} ejecuciones")
+        historial = pd.DataFrame([
+            {
+                "Inicio": r["inicio"],
+                "Segundos": r["segundos"],
+                "KB": round(r["bytes_descargados"] / 1024, 1),
+                "Aciertos": sum(c["aciertos"] for c in r["cache"].values()),
+                "Fallos": sum(c["fallos"] for c in r["cache"].values()),
+            }
+            for r in recientes
+        ])
+        st.dataframe(historial, hide_index=True, use_container_width=True)
+        
+        uso = uso_memoria()
+        if uso:
+            st.caption("Memoria cacheada por proyecto (del más al menos reciente)")
+            memoria = pd.DataFrame([
+                {"Proyecto": proyecto, "MB": round(tamano / 1e6, 1)}
+                for proyecto, tamano in uso.items()
+            ])
+            st.dataframe(memoria, hide_index=True, use_container_width=True)
+        
+        acumulado = totales()
+        st.caption(f"Descargado desde el inicio del proceso: {acumulado['bytes_descargados'] / 1e6:,.1f} MB")
+
 # Ejecutar aplicación
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    # Con DIAGNOSTICO = true en los secretos se muestra el panel y se emite el log estructurado
+    diagnostico_activo = bool(leer_config("DIAGNOSTICO", False))
+    if diagnostico_activo:
+        activar_log()
+    with ejecucion():
+        main()
+    if diagnostico_activo:
+        mostrar_diagnostico() 
\ No newline at end of file
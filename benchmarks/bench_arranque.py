@@ -0,0 +1,69 @@
+"""Perfil de arranque en frío del dashboard.
+
+Cada medición se hace en un proceso nuevo para que no haya módulos ya
+cargados: el tiempo de importar cada dependencia pesada por separado y el
+tiempo del primer render completo de app.py (AppTest), indicando qué
+dependencias pesadas quedaron cargadas tras ese primer render.
+
+Uso: python benchmarks/bench_arranque.py [--app app.py] [--datos CARPETA]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULOS_PESADOS = ["plotly.express", "st_aggrid", "googleapiclient.discovery", "google.oauth2.service_account"]
+
+CODIGO_IMPORTACION = """
+import time
+inicio = time.perf_counter()
+import {modulo}
+print(time.perf_counter() - inicio)
+"""
+
+CODIGO_PRIMER_RENDER = """
+import json, sys, time
+inicio = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({app!r}, default_timeout=120)
+at.run()
+tiempo = time.perf_counter() - inicio
+print(json.dumps({{
+    "tiempo": tiempo,
+    "errores": len(at.exception),
+    "cargados": [m for m in {modulos!r} if m in sys.modules],
+}}))
+"""
+
+def ejecutar(codigo, cwd):
+    """Ejecuta código en un intérprete nuevo y devuelve la última línea de su salida"""
+    salida = subprocess.run(
+        [sys.executable, "-c", codigo], cwd=cwd, capture_output=True, text=True, check=True
+    ).stdout
+    return salida.strip().splitlines()[-1]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--app", default=os.path.join(RAIZ, "app.py"))
+    parser.add_argument("--datos", default=RAIZ, help="carpeta con AO_GENERAL.txt y REPORTE SEMANAL")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'módulo':<32} {'importación (s)':>16}")
+    for modulo in MODULOS_PESADOS:
+        tiempos = [float(ejecutar(CODIGO_IMPORTACION.format(modulo=modulo), args.datos))
+                   for _ in range(args.repeticiones)]
+        print(f"{modulo:<32} {min(tiempos):>16.3f}")
+
+    codigo = CODIGO_PRIMER_RENDER.format(app=os.path.abspath(args.app), modulos=MODULOS_PESADOS)
+    resultados = [json.loads(ejecutar(codigo, args.datos)) for _ in range(args.repeticiones)]
+    mejor = min(resultados, key=lambda r: r["tiempo"])
+    print(f"\nPrimer render ({os.path.basename(args.app)}): {mejor['tiempo']:.3f} s, "
+          f"{mejor['errores']} excepciones")
+    print("Dependencias pesadas cargadas: " + (", ".join(mejor["cargados"]) or "ninguna"))
+
+if __name__ == "__main__":
+    main()
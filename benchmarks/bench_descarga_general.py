@@ -0,0 +1,58 @@
+"""Micro-benchmark de memoria al descargar y leer un AO_GENERAL.txt grande.
+
+Compara la descarga anterior (execute() a bytes, decode a str y StringIO) con
+descargar_flujo, que descarga por fragmentos con MediaIoBaseDownload a un
+BytesIO que se pasa directo a pd.read_csv. Drive se simula con
+sintetico.ServicioSimulado, que responde a peticiones con Range como get_media.
+Reporta tiempo y memoria máxima (tracemalloc) de descarga + lectura.
+
+Uso: python benchmarks/bench_descarga_general.py [--mb 100]
+"""
+import argparse
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from drive import descargar_flujo
+from procesamiento import leer_ao_general
+from sintetico import ServicioSimulado, filas_para_megabytes, generar_ao_general
+
+def leer_antes(service):
+    """Descarga anterior: bytes completos, decode a str y StringIO"""
+    file_content = service.files().get_media(fileId="ID").execute()
+    content_str = file_content.decode('utf-8')
+    return leer_ao_general(io.StringIO(content_str))
+
+def leer_despues(service):
+    """Descarga actual: fragmentos a un BytesIO leído directamente por pandas"""
+    return leer_ao_general(descargar_flujo(service, "ID"))
+
+def medir(funcion, service):
+    """Devuelve (tiempo en segundos, memoria máxima en bytes, filas leídas)"""
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    df = funcion(service)
+    tiempo = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return tiempo, pico, len(df)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mb", type=int, default=100)
+    args = parser.parse_args()
+
+    service = ServicioSimulado(generar_ao_general(filas_para_megabytes(args.mb)))
+    print(f"Archivo sintético: {len(service.http.contenido) / 1e6:.1f} MB")
+
+    print(f"{'variante':<10} {'tiempo (s)':>11} {'filas':>10} {'memoria máx (MB)':>17}")
+    for nombre, funcion in [("antes", leer_antes), ("después", leer_despues)]:
+        tiempo, pico, filas = medir(funcion, service)
+        print(f"{nombre:<10} {tiempo:>11.3f} {filas:>10,} {pico / 1e6:>17.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Micro-benchmark de la lectura de archivos semanales *_AO_GENERAL.txt.
+
+Compara la lectura anterior (todas las columnas con QUOTE_NONE y limpieza de
+comillas columna por columna) con leer_archivo_semanal, la lectura del
+dashboard, que quita las comillas del flujo antes del tokenizador y lee solo
+las columnas de la foto semanal. Reporta filas/s y memoria máxima
+(tracemalloc) de cada variante.
+
+Uso: python benchmarks/bench_lectura_semanal.py [--filas 200000] [--columnas 30]
+"""
+import argparse
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from procesamiento import leer_archivo_semanal
+from sintetico import COLUMNAS_ARCHIVO, generar_ao_general
+
+def leer_antes(contenido):
+    """Lectura previa: todas las columnas y limpieza de comillas en cada columna de texto"""
+    dfw = pd.read_csv(io.BytesIO(contenido), sep='\t', header=1, dtype=str, quoting=3)
+    dfw = dfw.dropna(how="all")
+    dfw = dfw.rename(columns=lambda x: x.strip().replace('"', '') if isinstance(x, str) else x)
+    for col in dfw.columns:
+        if pd.api.types.is_string_dtype(dfw[col]):
+            dfw[col] = dfw[col].astype(str).str.replace('"', '')
+    dfw["VolumenHA"] = pd.to_numeric(dfw["VolumenHA"].str.replace(",", ".", regex=False), errors='coerce')
+    return dfw
+
+def leer_despues(contenido):
+    """Lectura actual del dashboard (la misma que usan el historial y los resúmenes)"""
+    return leer_archivo_semanal(io.BytesIO(contenido))
+
+def medir(funcion, contenido, repeticiones):
+    """Devuelve (mejor tiempo en segundos, memoria máxima en bytes, filas leídas)"""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        df = funcion(contenido)
+        tiempos.append(time.perf_counter() - inicio)
+
+    tracemalloc.start()
+    funcion(contenido)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(tiempos), pico, len(df)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--filas", type=int, default=200_000)
+    parser.add_argument("--columnas", type=int, default=30)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+
+    contenido = generar_ao_general(args.filas, columnas_extra=max(0, args.columnas - len(COLUMNAS_ARCHIVO)))
+    print(f"Archivo sintético: {args.filas} filas, {args.columnas} columnas, "
+          f"{len(contenido) / 1e6:.1f} MB")
+
+    # Ambas variantes deben entregar los mismos valores en las columnas usadas
+    antes = leer_antes(contenido)[["Nivel", "Elementos", "VolumenHA"]]
+    despues = leer_despues(contenido)[["Nivel", "Elementos", "VolumenHA"]].astype({"Nivel": str, "Elementos": str})
+    pd.testing.assert_frame_equal(antes.reset_index(drop=True), despues.reset_index(drop=True), check_dtype=False)
+
+    print(f"{'variante':<10} {'tiempo (s)':>11} {'filas/s':>12} {'memoria máx (MB)':>17}")
+    for nombre, funcion in [("antes", leer_antes), ("después", leer_despues)]:
+        tiempo, pico, filas = medir(funcion, contenido, args.repeticiones)
+        print(f"{nombre:<10} {tiempo:>11.3f} {filas / tiempo:>12,.0f} {pico / 1e6:>17.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""Benchmark de la cadena completa de carga, lectura y agregación.
+
+Ejecuta sin Streamlit ni Drive las mismas etapas que recorre el dashboard:
+descarga del AO_GENERAL (con sintetico.ServicioSimulado en lugar de Drive),
+lectura, cache Parquet, cubo del avance general, resúmenes semanales (desde
+archivos locales generados), unión semanal, tablas semanal y trisemanal y
+consultas al historial por Fecha.
+Para cada etapa reporta tiempo, filas/s y RSS máximo del proceso durante la
+etapa. Con --json escribe los resultados en un archivo y con --comparar
+muestra la variación respecto de un resultado anterior.
+
+Uso: python benchmarks/bench_pipeline.py [--filas 200000] [--semanas 20]
+     [--filas-semana 20000] [--procesos N] [--json resultado.json] [--comparar base.json]
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import procesamiento
+from drive import MAX_DESCARGAS_CONCURRENTES, descargar_flujo
+from procesamiento import (
+    PROCESOS_LECTURA, avance_semanal, avance_trisemanal, cargar_ao_general_version, cargar_resumenes_semanales,
+    construir_pivot_semanal, construir_pivot_trisemanal, firma_archivo, leer_ao_general, leer_historial,
+    resumenes_avance, ultimas_semanas, unir_resumenes_semanales,
+)
+from proyectos import descartar
+from sintetico import ServicioSimulado, generar_ao_general, generar_semanas
+
+class MedidorRSS:
+    """Muestrea el RSS del proceso en un hilo y guarda el máximo observado"""
+
+    def __init__(self, intervalo=0.005):
+        self.intervalo = intervalo
+        self.maximo = 0
+        self._detener = threading.Event()
+        self._pagina = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+    def _rss(self):
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * self._pagina
+        except OSError:
+            # Sin /proc solo se conoce el máximo de todo el proceso
+            maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return maximo if sys.platform == "darwin" else maximo * 1024
+
+    def _muestrear(self):
+        while not self._detener.is_set():
+            self.maximo = max(self.maximo, self._rss())
+            self._detener.wait(self.intervalo)
+
+    def __enter__(self):
+        self.inicial = self.maximo = self._rss()
+        self._hilo = threading.Thread(target=self._muestrear, daemon=True)
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *excepcion):
+        self._detener.set()
+        self._hilo.join()
+        self.maximo = max(self.maximo, self._rss())
+
+def medir(resultados, etapa, filas, funcion, *args):
+    """Ejecuta una etapa, agrega su medición a resultados y devuelve su resultado"""
+    with MedidorRSS() as rss:
+        inicio = time.perf_counter()
+        valor = funcion(*args)
+        tiempo = time.perf_counter() - inicio
+    resultados.append({
+        "etapa": etapa,
+        "segundos": round(tiempo, 4),
+        "filas": filas,
+        "filas_por_segundo": round(filas / tiempo) if tiempo > 0 else None,
+        "rss_max_mb": round(rss.maximo / 1e6, 1),
+        "rss_incremento_mb": round((rss.maximo - rss.inicial) / 1e6, 1),
+    })
+    return valor
+
+def ejecutar(args, directorio):
+    """Genera los datos sintéticos y mide cada etapa; devuelve la lista de mediciones"""
+    procesamiento.DIRECTORIO_CACHE_GENERAL = os.path.join(directorio, "cache", "general")
+    procesamiento.DIRECTORIO_CACHE_SEMANAL = os.path.join(directorio, "cache", "semanal")
+    procesamiento.DIRECTORIO_HISTORIAL = os.path.join(directorio, "cache", "historial")
+    descartar(procesamiento.CACHE_RESUMENES)
+
+    service = ServicioSimulado(generar_ao_general(args.filas))
+    semanas = generar_semanas(os.path.join(directorio, "REPORTE SEMANAL"), args.semanas, args.filas_semana)
+    archivos = [(ruta, firma_archivo(ruta), fecha) for ruta, fecha in semanas]
+    filas_semanales = args.semanas * args.filas_semana
+
+    resultados = []
+    buffer = medir(resultados, "descarga_general", args.filas, descargar_flujo, service, "ID")
+    df = medir(resultados, "lectura_general", args.filas, leer_ao_general, buffer)
+    medir(resultados, "cache_general_frio", args.filas,
+          cargar_ao_general_version, "bench", lambda: descargar_flujo(service, "ID"))
+    df = medir(resultados, "cache_general_caliente", args.filas,
+               cargar_ao_general_version, "bench", lambda: None)
+    medir(resultados, "cubo_avance", len(df), resumenes_avance, df)
+
+    medir(resultados, "resumen_semanal_frio", filas_semanales, cargar_resumenes_semanales, archivos,
+          None, None, MAX_DESCARGAS_CONCURRENTES, args.procesos)
+    descartar(procesamiento.CACHE_RESUMENES)
+    medir(resultados, "resumen_semanal_disco", filas_semanales, cargar_resumenes_semanales, archivos)
+    resumenes = medir(resultados, "resumen_semanal_memoria", filas_semanales, cargar_resumenes_semanales, archivos)
+
+    dataset = medir(resultados, "union_semanal", filas_semanales, unir_resumenes_semanales, resumenes)
+    df_semana = medir(resultados, "avance_semanal", len(dataset), avance_semanal, dataset)
+    fechas = sorted(df_semana["Fecha"].unique())
+    medir(resultados, "pivot_semanal", len(df_semana), construir_pivot_semanal, df_semana, fechas)
+
+    fechas_tri = fechas[-2:]
+    df_tri = medir(resultados, "avance_trisemanal", len(dataset), avance_trisemanal, dataset, fechas_tri)
+    medir(resultados, "pivot_trisemanal", len(df_tri), construir_pivot_trisemanal, df_tri, fechas_tri)
+
+    medir(resultados, "historial_completo", filas_semanales, leer_historial)
+    medir(resultados, "historial_ultimas_2", 2 * args.filas_semana, ultimas_semanas, 2)
+    return resultados
+
+def imprimir(resultados, base=None):
+    """Muestra la tabla de resultados, con la variación de tiempo respecto de base"""
+    anteriores = {r["etapa"]: r for r in (base or {}).get("etapas", [])}
+    encabezado = f"{'etapa':<26} {'tiempo (s)':>11} {'filas/s':>13} {'RSS máx (MB)':>13} {'+RSS (MB)':>10}"
+    print(encabezado + (f" {'vs base':>9}" if base else ""))
+    for r in resultados:
+        linea = (f"{r['etapa']:<26} {r['segundos']:>11.3f} {r['filas_por_segundo'] or 0:>13,} "
+                 f"{r['rss_max_mb']:>13.1f} {r['rss_incremento_mb']:>10.1f}")
+        anterior = anteriores.get(r["etapa"])
+        if anterior and anterior["segundos"] > 0:
+            linea += f" {r['segundos'] / anterior['segundos']:>8.2f}x"
+        print(linea)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--filas", type=int, default=200_000, help="filas del AO_GENERAL")
+    parser.add_argument("--semanas", type=int, default=20, help="archivos semanales")
+    parser.add_argument("--filas-semana", type=int, default=20_000, help="filas de cada archivo semanal")
+    parser.add_argument("--procesos", type=int, default=PROCESOS_LECTURA,
+                        help="procesos para resumir los archivos semanales (1 = en el proceso actual)")
+    parser.add_argument("--json", help="archivo donde guardar los resultados")
+    parser.add_argument("--comparar", help="resultado JSON anterior con el que comparar")
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp(prefix="bench_pipeline_")
+    try:
+        resultados = ejecutar(args, directorio)
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    salida = {
+        "parametros": {
+            "filas": args.filas, "semanas": args.semanas, "filas_semana": args.filas_semana,
+            "procesos": args.procesos,
+        },
+        "entorno": {
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "plataforma": platform.platform(),
+        },
+        "etapas": resultados,
+    }
+
+    base = None
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            base = json.load(f)
+    imprimir(resultados, base)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(salida, f, indent=2, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
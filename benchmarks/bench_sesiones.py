@@ -0,0 +1,70 @@
+"""Benchmark de memoria por sesión y tiempo de carga por rerun del AO_GENERAL.
+
+Compara la carga anterior, con st.cache_data (cada llamada deserializa una
+copia nueva del DataFrame), con el cache de proyectos (todas las sesiones
+reciben el mismo objeto). Simula varias sesiones que cargan el dataset en
+cada rerun y mantienen su referencia mientras dura la ejecución; reporta el
+tiempo medio de carga y la memoria que agrega cada sesión.
+
+Uso: python benchmarks/bench_sesiones.py [--filas 300000] [--sesiones 8] [--reruns 5]
+"""
+import argparse
+import io
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import streamlit as st
+
+from bench_pipeline import MedidorRSS
+from procesamiento import leer_ao_general
+from proyectos import memo
+from sintetico import generar_ao_general
+
+def medir(cargar, sesiones, reruns):
+    """Devuelve (ms por carga, MB agregados por sesión) manteniendo una referencia por sesión"""
+    cargar()  # primera carga fuera de la medición
+    tiempos = []
+    with MedidorRSS() as rss:
+        for _ in range(reruns):
+            referencias = []
+            for _ in range(sesiones):
+                inicio = time.perf_counter()
+                referencias.append(cargar())
+                tiempos.append(time.perf_counter() - inicio)
+            del referencias
+    return sum(tiempos) / len(tiempos) * 1e3, (rss.maximo - rss.inicial) / 1e6 / sesiones
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--filas", type=int, default=300_000)
+    parser.add_argument("--sesiones", type=int, default=8)
+    parser.add_argument("--reruns", type=int, default=5)
+    args = parser.parse_args()
+
+    # Fuera de `streamlit run` los decoradores de cache avisan en cada llamada
+    for nombre in list(logging.root.manager.loggerDict):
+        if nombre.startswith("streamlit"):
+            logging.getLogger(nombre).setLevel(logging.ERROR)
+
+    df = leer_ao_general(io.BytesIO(generar_ao_general(args.filas)))
+    print(f"Dataset: {len(df):,} filas, {df.memory_usage(deep=True).sum() / 1e6:.1f} MB en memoria")
+
+    @st.cache_data(show_spinner=False)
+    def cargar_cache_data():
+        return df
+
+    variantes = [
+        ("antes (st.cache_data)", cargar_cache_data),
+        ("después (compartido)", lambda: memo("bench", ("general", "v"), lambda: df)),
+    ]
+    print(f"{'variante':<24} {'carga por rerun (ms)':>21} {'memoria por sesión (MB)':>24}")
+    for nombre, cargar in variantes:
+        ms, mb = medir(cargar, args.sesiones, args.reruns)
+        print(f"{nombre:<24} {ms:>21.2f} {mb:>24.1f}")
+
+if __name__ == "__main__":
+    main()
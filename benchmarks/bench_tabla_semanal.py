@@ -0,0 +1,62 @@
+"""Benchmark del tamaño de la tabla semanal que se envía al navegador.
+
+Construye la tabla pivot semanal de un avance sintético con cada vez más
+semanas y compara el tamaño serializado en Arrow (el formato con que
+st.dataframe envía los datos) de la tabla completa en float64 contra la
+ventana de las últimas semanas en float32 que muestra el dashboard.
+
+Uso: python benchmarks/bench_tabla_semanal.py [--semanas 10 50 150] [--visibles 8]
+"""
+import argparse
+import datetime
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from procesamiento import SEMANAS_VISIBLES, construir_pivot_semanal, tabla_para_mostrar, ventana_semanal
+from sintetico import ELEMENTOS, NIVELES
+
+def avance_sintetico(semanas, semilla=0):
+    """VolumenHA por (Nivel, Elementos, Fecha) como el que devuelve avance_semanal"""
+    rnd = np.random.default_rng(semilla)
+    inicio = datetime.datetime(2025, 1, 6)
+    fechas = [inicio + datetime.timedelta(weeks=n) for n in range(semanas)]
+    indice = pd.MultiIndex.from_product([NIVELES, ELEMENTOS, fechas], names=["Nivel", "Elementos", "Fecha"])
+    df = indice.to_frame(index=False)
+    df["VolumenHA"] = rnd.random(len(df)) * 300
+    return df, fechas
+
+def bytes_arrow(tabla):
+    """Bytes de la tabla serializada como flujo IPC de Arrow"""
+    tabla = tabla.copy()
+    tabla.columns = [str(col) for col in tabla.columns]
+    sumidero = pa.BufferOutputStream()
+    arrow = pa.Table.from_pandas(tabla, preserve_index=False)
+    with pa.ipc.new_stream(sumidero, arrow.schema) as escritor:
+        escritor.write_table(arrow)
+    return sumidero.getvalue().size
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--semanas", type=int, nargs="+", default=[10, 50, 150])
+    parser.add_argument("--visibles", type=int, default=SEMANAS_VISIBLES)
+    args = parser.parse_args()
+
+    print(f"{'semanas':>8} {'columnas':>9} {'completa (KB)':>14} {'ventana':>8} {'ventana (KB)':>13} {'ventana (ms)':>13}")
+    for semanas in args.semanas:
+        df_semana, fechas = avance_sintetico(semanas)
+        pivot = construir_pivot_semanal(df_semana, fechas)
+        inicio = time.perf_counter()
+        visible = tabla_para_mostrar(ventana_semanal(pivot, fechas, args.visibles))
+        tiempo = time.perf_counter() - inicio
+        print(f"{semanas:>8} {pivot.shape[1]:>9} {bytes_arrow(pivot) / 1e3:>14.1f} "
+              f"{visible.shape[1]:>8} {bytes_arrow(visible) / 1e3:>13.1f} {tiempo * 1e3:>13.2f}")
+
+if __name__ == "__main__":
+    main()
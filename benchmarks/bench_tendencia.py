@@ -0,0 +1,62 @@
+"""Benchmark del gráfico de tendencia con una serie por Nivel.
+
+Compara el gráfico anterior (px.line con todos los puntos, trazos SVG) con el
+que arma el dashboard (series cacheadas, reducidas a PUNTOS_TENDENCIA puntos y
+dibujadas con Scattergl) para historias cada vez más largas: tiempo de armar
+la figura y tamaño del JSON que se envía al navegador.
+
+Uso: python benchmarks/bench_tendencia.py [--semanas 150 1000 5000] [--puntos 1000]
+"""
+import argparse
+import os
+import sys
+import time
+
+import plotly.express as px
+import plotly.graph_objects as go
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_tabla_semanal import avance_sintetico
+from procesamiento import PUNTOS_TENDENCIA, series_para_grafico, series_tendencia
+
+def figura_anterior(df_semana):
+    """px.line con una línea por Nivel y todos los puntos"""
+    df_tendencia = df_semana.groupby(["Fecha", "Nivel"])["VolumenHA"].sum().reset_index()
+    return px.line(df_tendencia, x="Fecha", y="VolumenHA", color="Nivel")
+
+def figura_nueva(tendencia):
+    """Scattergl con las series ya reducidas"""
+    return go.Figure(data=[
+        go.Scattergl(x=serie["Fecha"], y=serie["VolumenHA"], mode="lines", name=str(grupo))
+        for grupo, serie in tendencia.groupby("Grupo", sort=False, observed=True)
+    ])
+
+def medir(armar):
+    """(ms para armar la figura y serializarla, KB del JSON)"""
+    inicio = time.perf_counter()
+    cuerpo = armar().to_json()
+    return (time.perf_counter() - inicio) * 1e3, len(cuerpo) / 1e3
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--semanas", type=int, nargs="+", default=[150, 1000, 5000])
+    parser.add_argument("--puntos", type=int, default=PUNTOS_TENDENCIA)
+    args = parser.parse_args()
+
+    print(f"{'semanas':>8} {'antes (ms)':>11} {'antes (KB)':>11} {'series (ms)':>12} "
+          f"{'rerun (ms)':>11} {'después (KB)':>13}")
+    for semanas in args.semanas:
+        df_semana, _ = avance_sintetico(semanas)
+        ms_antes, kb_antes = medir(lambda: figura_anterior(df_semana))
+
+        # Las series se calculan una vez por versión; en cada rerun solo se arma la figura
+        inicio = time.perf_counter()
+        tendencia = series_para_grafico(series_tendencia(df_semana, "Nivel")["Acumulado"], args.puntos)
+        ms_series = (time.perf_counter() - inicio) * 1e3
+        ms_rerun, kb_despues = medir(lambda: figura_nueva(tendencia))
+        print(f"{semanas:>8} {ms_antes:>11.1f} {kb_antes:>11.1f} {ms_series:>12.1f} "
+              f"{ms_rerun:>11.1f} {kb_despues:>13.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Datos sintéticos y un Drive simulado para los benchmarks.
+
+Genera archivos con el formato de AO_GENERAL.txt (tabulados, valores entre
+comillas, encabezado en la segunda línea) y un servicio que responde a
+files().get_media() desde memoria, con o sin Range como Drive.
+"""
+import datetime
+import os
+import random
+import re
+
+import httplib2
+
+COLUMNAS_ARCHIVO = [
+    "ID", "Nivel", "Elementos", "Hormigonado", "VolumenHA", "Moldaje", "AreaMoldaje",
+    "Enfierradura", "Cuantia", "FC_CON_FECHA EJECUCION", "FC_CON_TRISEMANAL", "Observaciones",
+]
+
+NIVELES = [f"Nivel {i}" for i in range(1, 21)]
+ELEMENTOS = ["Muro", "Losa", "Pilar", "Viga", "Fundación", "Escalera"]
+SEMANAS = ["Semana 01", "Semana 02", "Semana 03"]
+
+def _fila(rnd, i, columnas_extra):
+    """Valores de una fila sintética"""
+    return [
+        str(i), rnd.choice(NIVELES), rnd.choice(ELEMENTOS),
+        rnd.choice(["Sí", "No"]), f"{rnd.random() * 10:.2f}".replace(".", ","),
+        rnd.choice(["Sí", "No"]), f"{rnd.random() * 20:.2f}".replace(".", ","),
+        rnd.choice(["Sí", "No"]), f"{rnd.random() * 5:.2f}".replace(".", ","),
+        f"{rnd.randint(1, 28):02d}/{rnd.randint(1, 12):02d}/2025",
+        rnd.choice(SEMANAS), f"elemento {i % 997} sin observaciones",
+    ] + [f"valor {i % 97}" for _ in range(columnas_extra)]
+
+def generar_ao_general(filas, columnas_extra=0, semilla=0):
+    """Genera un AO_GENERAL sintético (bytes) con filas filas"""
+    rnd = random.Random(semilla)
+    encabezados = COLUMNAS_ARCHIVO + [f"Columna_{i:02d}" for i in range(columnas_extra)]
+    lineas = ["Reporte AO_GENERAL", "\t".join(f'"{c}"' for c in encabezados)]
+    for i in range(filas):
+        lineas.append("\t".join(f'"{v}"' for v in _fila(rnd, i, columnas_extra)))
+    return ("\n".join(lineas) + "\n").encode("utf-8")
+
+def filas_para_megabytes(megabytes, columnas_extra=0):
+    """Número aproximado de filas para que generar_ao_general ocupe megabytes"""
+    muestra = generar_ao_general(1000, columnas_extra)
+    return int(megabytes * 1_000_000 / (len(muestra) / 1000))
+
+def generar_semanas(directorio, semanas, filas, columnas_extra=0, semilla=0):
+    """Escribe semanas archivos DD-MM-AAAA_AO_GENERAL.txt (uno por lunes) en directorio.
+
+    Devuelve una lista de (ruta, fecha) ordenada por fecha.
+    """
+    os.makedirs(directorio, exist_ok=True)
+    inicio = datetime.date(2025, 1, 6)
+    archivos = []
+    for n in range(semanas):
+        fecha = inicio + datetime.timedelta(weeks=n)
+        ruta = os.path.join(directorio, f"{fecha:%d-%m-%Y}_AO_GENERAL.txt")
+        with open(ruta, "wb") as f:
+            f.write(generar_ao_general(filas, columnas_extra, semilla=semilla + n))
+        archivos.append((ruta, datetime.datetime(fecha.year, fecha.month, fecha.day)))
+    return archivos
+
+class HttpSimulado:
+    """Servidor en memoria que responde como Drive a get_media (con o sin Range)"""
+
+    def __init__(self, contenido):
+        self.contenido = contenido
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        rango = (headers or {}).get("range")
+        if rango is None:
+            # execute() recibe el cuerpo completo en una sola respuesta
+            return httplib2.Response({"status": 200}), bytes(self.contenido)
+        inicio, fin = map(int, re.match(r"bytes=(\d+)-(\d+)", rango).groups())
+        fragmento = self.contenido[inicio:fin + 1]
+        return httplib2.Response({
+            "status": 206,
+            "content-range": f"bytes {inicio}-{inicio + len(fragmento) - 1}/{len(self.contenido)}",
+        }), fragmento
+
+class PeticionSimulada:
+    """Equivalente mínimo de HttpRequest para get_media"""
+
+    def __init__(self, http):
+        self.http = http
+        self.uri = "https://www.googleapis.com/drive/v3/files/ID?alt=media"
+        self.headers = {}
+
+    def execute(self, http=None, num_retries=0):
+        return self.http.request(self.uri)[1]
+
+class ServicioSimulado:
+    """Servicio de Drive que solo implementa files().get_media() sobre un contenido fijo"""
+
+    def __init__(self, contenido):
+        self.http = HttpSimulado(contenido)
+
+    def files(self):
+        return self
+
+    def get_media(self, fileId):
+        return PeticionSimulada(self.http)
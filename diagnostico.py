@@ -0,0 +1,152 @@
+import collections
+import contextlib
+import functools
+import json
+import logging
+import threading
+import time
+
+# Ejecuciones (reruns) recientes que se guardan para el panel de diagnóstico
+MAX_EJECUCIONES = 20
+
+logger = logging.getLogger("diagnostico")
+
+# Ejecución en curso de cada hilo (Streamlit ejecuta cada rerun en un hilo)
+_hilo_local = threading.local()
+
+# Ejecuciones terminadas y contadores acumulados de todo el proceso
+_ejecuciones = collections.deque(maxlen=MAX_EJECUCIONES)
+_totales = {"cache": {}, "bytes_descargados": 0}
+_lock = threading.Lock()
+
+def _nuevo_registro():
+    """Registro vacío de una ejecución"""
+    return {"inicio": time.time(), "segundos": None, "tramos": {}, "cache": {}, "bytes_descargados": 0}
+
+def _actual():
+    """Registro de la ejecución en curso del hilo, o None (p. ej. en hilos de fondo)"""
+    return getattr(_hilo_local, "registro", None)
+
+@contextlib.contextmanager
+def tramo(nombre):
+    """Mide la duración de un tramo con nombre y la suma a la ejecución en curso"""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        segundos = time.perf_counter() - inicio
+        registro = _actual()
+        if registro is None:
+            logger.debug(json.dumps({"tramo": nombre, "segundos": round(segundos, 4)}))
+        else:
+            datos = registro["tramos"].setdefault(nombre, {"n": 0, "segundos": 0.0})
+            datos["n"] += 1
+            datos["segundos"] += segundos
+
+def medido(nombre):
+    """Decorador que mide cada llamada a la función como un tramo"""
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            with tramo(nombre):
+                return funcion(*args, **kwargs)
+        return envoltura
+    return decorador
+
+def _contar_cache(nombre, campo):
+    with _lock:
+        contador = _totales["cache"].setdefault(nombre, {"aciertos": 0, "fallos": 0})
+        contador[campo] += 1
+    registro = _actual()
+    if registro is not None:
+        contador = registro["cache"].setdefault(nombre, {"aciertos": 0, "fallos": 0})
+        contador[campo] += 1
+
+def contar_cache(nombre, acierto):
+    """Cuenta un acierto o fallo de un cache propio (sin decorador de Streamlit)"""
+    _contar_cache(nombre, "aciertos" if acierto else "fallos")
+
+def con_cache(cache, nombre=None):
+    """Aplica un decorador de cache (p. ej. st.cache_data(...)) contando aciertos y fallos.
+
+    La función original solo se ejecuta cuando el cache falla: si durante una
+    llamada no se ejecutó, la llamada cuenta como acierto.
+    """
+    def decorador(funcion):
+        clave = nombre or funcion.__name__
+
+        @functools.wraps(funcion)
+        def calcular(*args, **kwargs):
+            _hilo_local.fallos[clave] = True
+            return funcion(*args, **kwargs)
+
+        cacheada = cache(calcular)
+
+        @functools.wraps(funcion)
+        def llamar(*args, **kwargs):
+            if not hasattr(_hilo_local, "fallos"):
+                _hilo_local.fallos = {}
+            _hilo_local.fallos[clave] = False
+            with tramo(clave):
+                resultado = cacheada(*args, **kwargs)
+            _contar_cache(clave, "fallos" if _hilo_local.fallos.pop(clave, False) else "aciertos")
+            return resultado
+
+        llamar.clear = cacheada.clear
+        return llamar
+    return decorador
+
+def sumar_bytes(n):
+    """Suma bytes descargados al total del proceso y a la ejecución en curso"""
+    with _lock:
+        _totales["bytes_descargados"] += n
+    registro = _actual()
+    if registro is not None:
+        registro["bytes_descargados"] += n
+
+@contextlib.contextmanager
+def ejecucion():
+    """Agrupa los tramos, contadores y bytes de un rerun y lo registra al terminar"""
+    registro = _nuevo_registro()
+    _hilo_local.registro = registro
+    inicio = time.perf_counter()
+    try:
+        yield registro
+    finally:
+        registro["segundos"] = time.perf_counter() - inicio
+        _hilo_local.registro = None
+        with _lock:
+            _ejecuciones.append(registro)
+        logger.info(json.dumps(_resumen(registro), ensure_ascii=False))
+
+def _resumen(registro):
+    """Registro con los tiempos redondeados, para logs y tablas"""
+    return {
+        "inicio": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(registro["inicio"])),
+        "segundos": round(registro["segundos"], 4),
+        "bytes_descargados": registro["bytes_descargados"],
+        "cache": registro["cache"],
+        "tramos": {n: {"n": d["n"], "segundos": round(d["segundos"], 4)} for n, d in registro["tramos"].items()},
+    }
+
+def ejecuciones_recientes():
+    """Resúmenes de las últimas MAX_EJECUCIONES ejecuciones, de la más reciente a la más antigua"""
+    with _lock:
+        registros = list(_ejecuciones)
+    return [_resumen(r) for r in reversed(registros)]
+
+def totales():
+    """Contadores acumulados del proceso (incluye los hilos de fondo)"""
+    with _lock:
+        return {
+            "bytes_descargados": _totales["bytes_descargados"],
+            "cache": {n: dict(c) for n, c in _totales["cache"].items()},
+        }
+
+def activar_log(nivel=logging.INFO):
+    """Envía el log estructurado (una línea JSON por ejecución) a la consola"""
+    if not logger.handlers:
+        manejador = logging.StreamHandler()
+        manejador.setFormatter(logging.Formatter("%(asctime)s %(name)s %(message)s"))
+        logger.addHandler(manejador)
+    logger.setLevel(nivel)
@@ -0,0 +1,242 @@
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from diagnostico import medido, sumar_bytes, tramo
+
+# Las librerías de Google se importan dentro de cada función: el modo local
+# no las necesita y cargarlas retrasa el arranque de la aplicación
+
+# Descargas concurrentes por defecto y reintentos ante errores 429/5xx
+MAX_DESCARGAS_CONCURRENTES = 8
+REINTENTOS_DESCARGA = 4
+
+# Tamaño de cada fragmento al descargar archivos grandes
+TAMANO_FRAGMENTO_DESCARGA = 16 * 1024 * 1024
+
+# Segundos durante los que un listado de carpeta se usa sin consultar Drive
+TTL_LISTADO = 60
+
+SCOPES = ['https://www.googleapis.com/auth/drive.readonly']
+
+# Cada hilo usa su propio objeto HTTP: httplib2 no es thread-safe
+_hilo_local = threading.local()
+
+# Listados cacheados: folder_id -> {"archivos", "token", "hora"}
+_listados = {}
+_listados_lock = threading.Lock()
+
+def crear_credenciales(creds_dict):
+    """Crea las credenciales de la Service Account a partir de un diccionario"""
+    # Verificar que tenga los campos necesarios
+    required_fields = ["type", "project_id", "private_key", "client_email"]
+    missing_fields = [field for field in required_fields if field not in creds_dict]
+
+    if missing_fields:
+        return None
+
+    # Crear una copia limpia de las credenciales
+    clean_creds = {
+        "type": creds_dict["type"],
+        "project_id": creds_dict["project_id"],
+        "private_key_id": creds_dict["private_key_id"],
+        "client_email": creds_dict["client_email"],
+        "client_id": creds_dict["client_id"],
+        "auth_uri": creds_dict["auth_uri"],
+        "token_uri": creds_dict["token_uri"],
+        "auth_provider_x509_cert_url": creds_dict["auth_provider_x509_cert_url"],
+        "client_x509_cert_url": creds_dict["client_x509_cert_url"]
+    }
+
+    # Manejar el private_key de forma especial
+    private_key = creds_dict["private_key"]
+
+    # Si el private_key tiene \\n, reemplazarlo por \n
+    if "\\n" in private_key:
+        private_key = private_key.replace("\\n", "\n")
+
+    clean_creds["private_key"] = private_key
+
+    from google.oauth2 import service_account
+    return service_account.Credentials.from_service_account_info(clean_creds, scopes=SCOPES)
+
+def construir_servicio(creds):
+    """Construye el cliente de Google Drive v3 con el documento de descubrimiento
+    incluido en googleapiclient (sin descargarlo)"""
+    from googleapiclient.discovery import build
+    return build('drive', 'v3', credentials=creds, static_discovery=True, cache_discovery=False)
+
+def descargar_flujo(service, file_id, tamano_fragmento=TAMANO_FRAGMENTO_DESCARGA):
+    """Descarga un archivo de Google Drive por fragmentos a un BytesIO; None si falla.
+
+    Los fragmentos se escriben directamente en el buffer, que queda posicionado
+    al inicio para pasarlo a pd.read_csv sin decodificarlo ni copiarlo.
+    """
+    try:
+        from googleapiclient.http import MediaIoBaseDownload
+        buffer = io.BytesIO()
+        descarga = MediaIoBaseDownload(buffer, service.files().get_media(fileId=file_id),
+                                       chunksize=tamano_fragmento)
+        terminado = False
+        with tramo("drive.descarga"):
+            while not terminado:
+                _, terminado = descarga.next_chunk(num_retries=REINTENTOS_DESCARGA)
+        sumar_bytes(buffer.tell())
+        buffer.seek(0)
+        return buffer
+    except Exception as e:
+        return None
+
+@medido("drive.metadatos")
+def obtener_metadatos(service, file_id):
+    """Obtiene modifiedTime y md5Checksum de un archivo sin descargar su contenido"""
+    return service.files().get(fileId=file_id, fields="id, modifiedTime, md5Checksum, size").execute()
+
+@medido("drive.listado")
+def _listar_carpeta(service, folder_id):
+    """Lista todos los archivos de una carpeta siguiendo la paginación de Drive.
+
+    No se filtra por nombre en Drive: "name contains" solo compara prefijos de
+    palabras y podría omitir archivos; quien llama filtra los nombres.
+    """
+    q = f"'{folder_id}' in parents and trashed = false"
+
+    archivos = []
+    page_token = None
+    while True:
+        results = service.files().list(
+            q=q,
+            pageSize=1000,
+            pageToken=page_token,
+            fields="nextPageToken, files(id, name, modifiedTime)"
+        ).execute()
+        archivos.extend(results.get('files', []))
+        page_token = results.get('nextPageToken')
+        if not page_token:
+            break
+    return archivos
+
+def obtener_token_cambios(service):
+    """Obtiene el token actual del registro de cambios de Drive"""
+    return service.changes().getStartPageToken().execute().get('startPageToken')
+
+@medido("drive.cambios")
+def revisar_cambios(service, token, folder_id, ids_conocidos):
+    """Revisa el registro de cambios desde token.
+
+    Devuelve (hay_cambios, nuevo_token), donde hay_cambios indica si algún
+    cambio afecta a la carpeta o a alguno de sus archivos conocidos.
+    """
+    hay_cambios = False
+    page_token = token
+    while page_token:
+        results = service.changes().list(
+            pageToken=page_token,
+            pageSize=1000,
+            fields="nextPageToken, newStartPageToken, changes(fileId, file(parents))"
+        ).execute()
+        for cambio in results.get('changes', []):
+            parents = (cambio.get('file') or {}).get('parents', [])
+            if cambio.get('fileId') in ids_conocidos or folder_id in parents:
+                hay_cambios = True
+        if 'newStartPageToken' in results:
+            return hay_cambios, results['newStartPageToken']
+        page_token = results.get('nextPageToken')
+    return True, None
+
+def listar_archivos_carpeta(service, folder_id, ttl=TTL_LISTADO):
+    """Lista archivos de una carpeta con cache.
+
+    Durante ttl segundos se devuelve el listado cacheado sin consultar Drive.
+    Pasado ese tiempo se consulta el registro de cambios (una sola petición
+    pequeña si no hubo cambios) y solo se vuelve a listar la carpeta si algún
+    cambio la afecta.
+    """
+    clave = folder_id
+    with _listados_lock:
+        entrada = _listados.get(clave)
+
+    ahora = time.monotonic()
+    if entrada is not None:
+        if ahora - entrada["hora"] < ttl:
+            return list(entrada["archivos"])
+        if entrada["token"]:
+            try:
+                ids = {f['id'] for f in entrada["archivos"]}
+                hay_cambios, nuevo_token = revisar_cambios(service, entrada["token"], folder_id, ids)
+                if not hay_cambios and nuevo_token:
+                    with _listados_lock:
+                        _listados[clave] = dict(entrada, token=nuevo_token, hora=ahora)
+                    return list(entrada["archivos"])
+            except Exception as e:
+                pass
+
+    # Obtener el token antes de listar para no perder cambios intermedios
+    try:
+        token = obtener_token_cambios(service)
+    except Exception as e:
+        token = None
+
+    try:
+        archivos = _listar_carpeta(service, folder_id)
+    except Exception as e:
+        return list(entrada["archivos"]) if entrada is not None else []
+
+    with _listados_lock:
+        _listados[clave] = {"archivos": archivos, "token": token, "hora": ahora}
+    return list(archivos)
+
+def servicio_del_hilo(creds):
+    """Devuelve el cliente de Drive del hilo actual, creándolo si no existe.
+
+    Los hilos que no son de Streamlit (actualizador, API) lo usan en lugar de
+    un cliente compartido, cuyo objeto HTTP no se puede usar desde dos hilos.
+    """
+    creds_servicio, servicio = getattr(_hilo_local, "servicio", (None, None))
+    if servicio is None or creds_servicio is not creds:
+        servicio = construir_servicio(creds)
+        _hilo_local.servicio = (creds, servicio)
+    return servicio
+
+def _http_del_hilo(creds):
+    """Devuelve el objeto HTTP autorizado del hilo actual, creándolo si no existe"""
+    http = getattr(_hilo_local, "http", None)
+    if http is None or http.credentials is not creds:
+        import httplib2
+        from google_auth_httplib2 import AuthorizedHttp
+        http = AuthorizedHttp(creds, http=httplib2.Http(timeout=60))
+        _hilo_local.http = http
+    return http
+
+def _descargar_en_hilo(service, creds, file_id, reintentos):
+    """Descarga un archivo usando el HTTP propio del hilo (con reintentos y backoff)"""
+    request = service.files().get_media(fileId=file_id)
+    file_content = request.execute(http=_http_del_hilo(creds), num_retries=reintentos)
+    return io.BytesIO(file_content)
+
+def descargar_archivos(service, creds, file_ids, max_concurrentes=MAX_DESCARGAS_CONCURRENTES,
+                       reintentos=REINTENTOS_DESCARGA):
+    """Descarga varios archivos en paralelo y entrega (file_id, contenido) a medida que terminan.
+
+    El contenido es None si la descarga falla tras los reintentos. Los errores
+    429 y 5xx se reintentan con backoff exponencial (num_retries de googleapiclient).
+    """
+    file_ids = list(file_ids)
+    if not file_ids:
+        return
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_concurrentes, len(file_ids)))) as pool:
+        futuros = {
+            pool.submit(_descargar_en_hilo, service, creds, file_id, reintentos): file_id
+            for file_id in file_ids
+        }
+        for futuro in as_completed(futuros):
+            try:
+                contenido = futuro.result()
+            except Exception as e:
+                yield futuros[futuro], None
+                continue
+            # Se cuenta en el hilo que consume, que es el de la ejecución en curso
+            sumar_bytes(len(contenido.getbuffer()))
+            yield futuros[futuro], contenido
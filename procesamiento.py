@@ -0,0 +1,941 @@
+import csv
+import hashlib
+import io
+import multiprocessing
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pandas as pd
+
+from diagnostico import logger, medido, tramo
+from drive import descargar_archivos, listar_archivos_carpeta, MAX_DESCARGAS_CONCURRENTES
+from proyectos import guardar, obtener
+
+# Carpetas donde se guardan los datos ya procesados
+DIRECTORIO_CACHE_SEMANAL = os.path.join(".streamlit", "cache", "semanal")
+DIRECTORIO_CACHE_GENERAL = os.path.join(".streamlit", "cache", "general")
+
+# Versión del formato cacheado: cambiarla invalida los Parquet existentes
+VERSION_CACHE_GENERAL = 1
+# Días sin uso tras los que se borra un Parquet cacheado
+DIAS_CACHE_GENERAL = 7
+# Días sin uso tras los que se borra un resumen semanal cacheado en disco
+DIAS_CACHE_SEMANAL = 30
+
+# Columnas usadas por el dashboard
+COLUMNAS_CATEGORICAS = ["Nivel", "Elementos", "Hormigonado", "Moldaje", "Enfierradura", "FC_CON_TRISEMANAL"]
+COLUMNAS_NUMERICAS = ["VolumenHA", "AreaMoldaje", "Cuantia"]
+COLUMNA_FECHA = "FC_CON_FECHA EJECUCION"
+COLUMNAS_GENERAL = COLUMNAS_CATEGORICAS + COLUMNAS_NUMERICAS + [COLUMNA_FECHA]
+COLUMNAS_SEMANAL = ["Nivel", "Elementos", "Hormigonado", "VolumenHA", "FC_CON_TRISEMANAL"]
+
+# Métricas del avance general: columna de valor -> parámetro booleano
+METRICAS_AVANCE = {
+    "VolumenHA": "Hormigonado",
+    "AreaMoldaje": "Moldaje",
+    "Cuantia": "Enfierradura",
+}
+# Valores del parámetro booleano que cuentan como avance (el resto es 'no')
+VALORES_SI = ["si", "sí", "true", "1"]
+
+# Versión del formato de los resúmenes semanales: cambiarla invalida los cacheados
+VERSION_RESUMEN_SEMANAL = 2
+
+# Valor de FC_CON_TRISEMANAL para archivos que no traen esa columna (entran en
+# la comparación trisemanal igual que antes, sin filtrar por semana)
+SIN_TRISEMANAL = "(sin FC_CON_TRISEMANAL)"
+SEMANA_TRISEMANAL = "Semana 01"
+
+# Historial de fotos semanales completas, particionado por Fecha
+# (DIRECTORIO_HISTORIAL/Fecha=AAAA-MM-DD/<archivo>_<versión>.parquet)
+DIRECTORIO_HISTORIAL = os.path.join(".streamlit", "cache", "historial")
+VERSION_HISTORIAL = 1
+
+# Semanas que la tabla semanal muestra por defecto; las anteriores se suman en
+# una sola columna acumulada
+SEMANAS_VISIBLES = 8
+
+# Puntos máximos por serie del gráfico de tendencia; las historias más largas
+# se reducen antes de enviarlas al navegador
+PUNTOS_TENDENCIA = 1000
+
+# Los resúmenes en memoria se guardan en el cache de proyectos bajo esta clave,
+# compartidos por todos los proyectos y dentro del mismo presupuesto de memoria
+CACHE_RESUMENES = "resumenes_semanales"
+
+# Procesos que leen y resumen archivos semanales en paralelo (1 lee en el hilo
+# actual). Con menos de MIN_ARCHIVOS_POOL archivos pendientes, o archivos
+# locales que suman menos de MIN_BYTES_POOL, tampoco se usa el pool: enviar
+# el trabajo a otro proceso costaría más que leerlos
+PROCESOS_LECTURA = min(os.cpu_count() or 1, 8)
+MIN_ARCHIVOS_POOL = 4
+MIN_BYTES_POOL = 32 * 1024 * 1024
+
+# Pool de procesos compartido por todas las sesiones; se crea al primer uso
+_pool = {"executor": None, "procesos": 0}
+_pool_lock = threading.Lock()
+
+# Versiones de archivos (clave de su resumen) cuya foto ya se intentó agregar al
+# historial en este proceso: si no se pudo escribir no se vuelve a leer el archivo
+_fotos_intentadas = set()
+_fotos_lock = threading.Lock()
+
+# Tamaño de bloque al filtrar flujos de entrada
+TAMANO_BLOQUE = 1 << 20
+
+def firma_archivo(filepath):
+    """Firma (fecha de modificación y tamaño) con la que se detectan cambios en un archivo local"""
+    info = os.stat(filepath)
+    return f"{info.st_mtime_ns}-{info.st_size}"
+
+class FlujoSinComillas(io.RawIOBase):
+    """Flujo binario que elimina las comillas dobles antes de llegar al tokenizador.
+
+    Acepta una ruta o un objeto con read() (binario o de texto) y entrega los
+    mismos bytes sin '"', bloque a bloque, sin copiar el archivo completo.
+    """
+
+    def __init__(self, fuente):
+        if isinstance(fuente, (str, os.PathLike)):
+            self._fuente = open(fuente, 'rb')
+            self._propio = True
+        else:
+            self._fuente = fuente
+            self._propio = False
+        self._pendiente = memoryview(b"")
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pendiente:
+            datos = self._fuente.read(TAMANO_BLOQUE)
+            if not datos:
+                return 0
+            if isinstance(datos, str):
+                datos = datos.encode('utf-8')
+            self._pendiente = memoryview(datos.replace(b'"', b''))
+        n = min(len(buffer), len(self._pendiente))
+        buffer[:n] = self._pendiente[:n]
+        self._pendiente = self._pendiente[n:]
+        return n
+
+    def close(self):
+        if self._propio and not self.closed:
+            self._fuente.close()
+        super().close()
+
+def limpiar_nombre_columna(nombre):
+    """Quita espacios y comillas del nombre de una columna"""
+    return nombre.strip().replace('"', '') if isinstance(nombre, str) else nombre
+
+@medido("lectura.csv")
+def leer_ao_general(fuente, columnas=COLUMNAS_GENERAL, sin_comillas=False):
+    """Lee un archivo con formato AO_GENERAL (tabulado, encabezado en la segunda línea).
+
+    Solo se leen las columnas pedidas que existan en el archivo. Los valores
+    numéricos usan coma decimal, la fecha de ejecución es dd/mm/aaaa y las
+    columnas de texto repetitivas se devuelven como categorías. Con
+    sin_comillas las comillas se eliminan del flujo antes de tokenizar
+    (equivale a leer con QUOTE_NONE y limpiar cada valor). Si fuente es
+    una ruta, el archivo se lee memory-mapped o en bloques, sin cargarlo
+    completo en memoria.
+    """
+    if sin_comillas:
+        fuente = io.BufferedReader(FlujoSinComillas(fuente), buffer_size=TAMANO_BLOQUE)
+
+    df = pd.read_csv(
+        fuente,
+        sep="\t",
+        header=1,
+        dtype=str,
+        encoding='utf-8',
+        quoting=csv.QUOTE_NONE if sin_comillas else csv.QUOTE_MINIMAL,
+        memory_map=isinstance(fuente, (str, os.PathLike)),
+        usecols=lambda x: limpiar_nombre_columna(x) in columnas
+    )
+    df = df.rename(columns=limpiar_nombre_columna)
+    df = df.dropna(how="all")
+
+    # Convertir tipos de datos
+    for col in COLUMNAS_NUMERICAS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col].str.replace(",", ".", regex=False), errors='coerce')
+
+    if COLUMNA_FECHA in df.columns:
+        df[COLUMNA_FECHA] = pd.to_datetime(df[COLUMNA_FECHA], dayfirst=True, errors='coerce')
+
+    for col in COLUMNAS_CATEGORICAS:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+
+    return df
+
+def _escribir_atomico(ruta, escribir):
+    """Escribe un archivo en un temporal y lo reemplaza de una vez, para que
+    otro hilo o proceso nunca lea un archivo a medio escribir"""
+    temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        escribir(temporal)
+        os.replace(temporal, ruta)
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+
+def _ruta_general(clave):
+    """Ruta en disco del Parquet asociado a un hash de contenido"""
+    return os.path.join(DIRECTORIO_CACHE_GENERAL, f"{clave}.parquet")
+
+def _limpiar_directorio(directorio, dias):
+    """Borra los archivos del directorio que no se han usado en los últimos días"""
+    limite = time.time() - dias * 86400
+    for nombre in os.listdir(directorio):
+        ruta = os.path.join(directorio, nombre)
+        try:
+            if os.path.getmtime(ruta) < limite:
+                os.remove(ruta)
+        except OSError as e:
+            continue
+
+def _limpiar_cache_general():
+    """Borra los Parquet que no se han usado en DIAS_CACHE_GENERAL días"""
+    _limpiar_directorio(DIRECTORIO_CACHE_GENERAL, DIAS_CACHE_GENERAL)
+
+def _cargar_ao_general(clave, obtener_contenido):
+    """Devuelve el Parquet cacheado con esa clave o lee y cachea el contenido obtenido"""
+    ruta = _ruta_general(clave)
+
+    if os.path.exists(ruta):
+        try:
+            with tramo("lectura.parquet"):
+                df = pd.read_parquet(ruta)
+            df.attrs["version"] = clave
+            os.utime(ruta)
+            return df
+        except Exception as e:
+            pass
+
+    contenido = obtener_contenido()
+    if contenido is None:
+        return None
+
+    # Se acepta una ruta, un flujo (p. ej. el BytesIO de la descarga) o bytes
+    if isinstance(contenido, (bytes, bytearray)):
+        contenido = io.BytesIO(contenido)
+    df = leer_ao_general(contenido)
+    df.attrs["version"] = clave
+
+    # Si no se puede escribir el Parquet (p. ej. sin pyarrow) se sigue sin cache
+    try:
+        os.makedirs(DIRECTORIO_CACHE_GENERAL, exist_ok=True)
+        with tramo("escritura.parquet"):
+            _escribir_atomico(ruta, lambda destino: df.to_parquet(destino, index=False))
+        _limpiar_cache_general()
+    except Exception as e:
+        pass
+
+    return df
+
+def leer_ao_general_cacheado(contenido):
+    """Lee el AO_GENERAL a partir de sus bytes o de un BytesIO, usando un Parquet cacheado por hash de contenido"""
+    if isinstance(contenido, io.BytesIO):
+        # Hash sobre el buffer interno, sin copiarlo
+        with contenido.getbuffer() as datos:
+            clave = hashlib.sha256(datos).hexdigest()[:32] + f"_v{VERSION_CACHE_GENERAL}"
+        contenido.seek(0)
+    else:
+        clave = hashlib.sha256(contenido).hexdigest()[:32] + f"_v{VERSION_CACHE_GENERAL}"
+    return _cargar_ao_general(clave, lambda: contenido)
+
+def cargar_ao_general_version(version, obtener_contenido):
+    """Carga el AO_GENERAL de una versión conocida de antemano (p. ej. el md5Checksum de Drive).
+
+    obtener_contenido solo se llama (para descargar los bytes) si esa versión
+    no está cacheada. Devuelve None si no se pudo obtener el contenido.
+    """
+    clave = "md5_" + hashlib.sha256(str(version).encode('utf-8')).hexdigest()[:32] + f"_v{VERSION_CACHE_GENERAL}"
+    return _cargar_ao_general(clave, obtener_contenido)
+
+def cargar_ao_general_local(filepath, firma=None):
+    """Carga un AO_GENERAL local pasando por el cache Parquet.
+
+    El cache se identifica por la ruta y la firma (mtime y tamaño) del archivo,
+    así que el archivo solo se lee si cambió, y se lee directamente desde la ruta.
+    """
+    firma = firma or firma_archivo(filepath)
+    origen = f"{os.path.abspath(filepath)}|{firma}"
+    clave = "local_" + hashlib.sha256(origen.encode('utf-8')).hexdigest()[:32] + f"_v{VERSION_CACHE_GENERAL}"
+    return _cargar_ao_general(clave, lambda: filepath)
+
+def _por_categoria(columna, condicion):
+    """Evalúa condicion una vez por categoría en lugar de una vez por fila.
+
+    condicion recibe un Index de textos; los valores nulos dan False.
+    """
+    if not isinstance(columna.dtype, pd.CategoricalDtype):
+        columna = columna.astype("category")
+    resultado = np.append(np.asarray(condicion(columna.cat.categories.astype(str)), dtype=bool), False)
+    return resultado[columna.cat.codes.to_numpy()]
+
+def calcular_cubo_avance(df):
+    """Agrupa el AO_GENERAL por (Nivel, Elementos) con Si/No/Total de todas las métricas.
+
+    Se hace una sola pasada de groupby para las tres métricas. Por cada
+    métrica hay columnas <valor>_Si, <valor>_No, <valor>_Total y <valor>_n
+    (filas con valor), de modo que cada tabla sea un simple corte del cubo.
+    """
+    # Solo filas con Nivel y Elementos válidos
+    validas = (
+        _por_categoria(df["Nivel"], lambda c: c.str.strip() != "")
+        & _por_categoria(df["Elementos"], lambda c: c.str.strip() != "")
+    )
+    base = df.loc[validas, ["Nivel", "Elementos"]]
+
+    columnas = {}
+    for valor_col, param_bool in METRICAS_AVANCE.items():
+        if valor_col not in df.columns or param_bool not in df.columns:
+            continue
+        valor = df.loc[validas, valor_col].to_numpy(dtype=float)
+        presente = ~np.isnan(valor)
+        valor = np.where(presente, valor, 0.0)
+        es_si = _por_categoria(df.loc[validas, param_bool], lambda c: c.str.strip().str.lower().isin(VALORES_SI))
+        columnas[f"{valor_col}_Si"] = np.where(es_si, valor, 0.0)
+        columnas[f"{valor_col}_No"] = np.where(es_si, 0.0, valor)
+        columnas[f"{valor_col}_Total"] = valor
+        columnas[f"{valor_col}_n"] = presente.astype(np.int64)
+
+    return base.assign(**columnas).groupby(["Nivel", "Elementos"], observed=True).sum()
+
+def resumen_desde_cubo(cubo, valor_col):
+    """Extrae del cubo la tabla Si/No/Total de una métrica; None si no hay datos"""
+    if f"{valor_col}_n" not in cubo.columns:
+        return None
+
+    resumen = cubo.loc[
+        cubo[f"{valor_col}_n"] > 0,
+        [f"{valor_col}_Si", f"{valor_col}_No", f"{valor_col}_Total"]
+    ]
+    resumen.columns = ["Si", "No", "Total"]
+    resumen = resumen.reset_index().astype({"Nivel": str, "Elementos": str})
+    if resumen.empty:
+        return None
+
+    resumen["Si%"] = np.where(resumen["Total"] > 0, (resumen["Si"] / resumen["Total"] * 100).round(2), 0)
+    resumen["No%"] = np.where(resumen["Total"] > 0, (resumen["No"] / resumen["Total"] * 100).round(2), 0)
+    resumen[valor_col] = resumen["Total"].round(2)
+    resumen["Si"] = resumen["Si"].round(2)
+    resumen["No"] = resumen["No"].round(2)
+    return resumen
+
+@medido("agregacion.cubo_avance")
+def resumenes_avance(df):
+    """Tablas Si/No/Total de las tres métricas, calculadas a partir de un único cubo"""
+    cubo = calcular_cubo_avance(df)
+    return {valor_col: resumen_desde_cubo(cubo, valor_col) for valor_col in METRICAS_AVANCE}
+
+def leer_archivo_semanal(fh):
+    """Lee la foto completa (columnas del dashboard) de un archivo semanal"""
+    # Los archivos semanales se leen sin quoting: las comillas se quitan del flujo
+    return leer_ao_general(fh, columnas=COLUMNAS_GENERAL, sin_comillas=True)
+
+def resumir_semana(dfw):
+    """Reduce la foto de una semana a VolumenHA hormigonado por (Nivel, Elementos, FC_CON_TRISEMANAL)"""
+    if dfw.empty:
+        return None
+
+    # Verificar que existan las columnas necesarias
+    if not {"VolumenHA", "Hormigonado", "Nivel", "Elementos"}.issubset(dfw.columns):
+        return None
+
+    # Solo Hormigonado = 'Sí'
+    dfw = dfw[dfw["Hormigonado"] == "Sí"]
+
+    # Solo filas con Nivel y Elementos válidos
+    dfw = dfw[dfw["Nivel"].notna() & (dfw["Nivel"].astype(str).str.strip() != "")]
+    dfw = dfw[dfw["Elementos"].notna() & (dfw["Elementos"].astype(str).str.strip() != "")]
+
+    # Solo filas con VolumenHA válido
+    dfw = dfw[dfw["VolumenHA"].notna() & (dfw["VolumenHA"] > 0)]
+
+    if dfw.empty:
+        return None
+
+    # Se conserva la semana trisemanal (incluidos los vacíos) para que la misma
+    # reducción sirva al avance semanal y a la comparación trisemanal
+    claves = ["Nivel", "Elementos", "FC_CON_TRISEMANAL"]
+    if "FC_CON_TRISEMANAL" not in dfw.columns:
+        dfw = dfw.assign(FC_CON_TRISEMANAL=SIN_TRISEMANAL)
+    dfw = dfw.astype({col: object for col in claves})
+
+    resumen = dfw.groupby(claves, dropna=False)["VolumenHA"].sum().reset_index()
+    return resumen.astype({"Nivel": str, "Elementos": str})
+
+def _directorio_semana(fecha):
+    """Partición del historial de una fecha"""
+    return os.path.join(DIRECTORIO_HISTORIAL, f"Fecha={pd.Timestamp(fecha):%Y-%m-%d}")
+
+def _ruta_historial(fecha, file_id, modified_time):
+    """Ruta en el historial de la foto de un archivo en una versión (modifiedTime)"""
+    archivo = hashlib.sha1(repr(file_id).encode('utf-8')).hexdigest()[:16]
+    version = hashlib.sha1(repr((modified_time, VERSION_HISTORIAL)).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(_directorio_semana(fecha), f"{archivo}_{version}.parquet")
+
+def en_historial(fecha, file_id, modified_time):
+    """Indica si la foto de esa versión del archivo ya está en el historial"""
+    return os.path.exists(_ruta_historial(fecha, file_id, modified_time))
+
+def guardar_en_historial(fecha, file_id, modified_time, dfw):
+    """Guarda la foto de una semana y borra las versiones anteriores del mismo archivo"""
+    _guardar_foto(_ruta_historial(fecha, file_id, modified_time), dfw)
+
+def _guardar_foto(ruta, dfw):
+    """Escribe una foto en su ruta del historial y borra las otras versiones del archivo"""
+    directorio, nombre = os.path.split(ruta)
+    os.makedirs(directorio, exist_ok=True)
+    with tramo("escritura.historial"):
+        _escribir_atomico(ruta, lambda destino: dfw.to_parquet(destino, index=False))
+
+    archivo = nombre.split("_")[0]
+    for otro in os.listdir(directorio):
+        if otro != nombre and otro.startswith(archivo + "_") and otro.endswith(".parquet"):
+            try:
+                os.remove(os.path.join(directorio, otro))
+            except OSError as e:
+                continue
+
+def leer_de_historial(fecha, file_id, modified_time):
+    """Foto guardada de esa versión del archivo; None si no está en el historial"""
+    try:
+        with tramo("lectura.historial"):
+            return pd.read_parquet(_ruta_historial(fecha, file_id, modified_time))
+    except Exception as e:
+        return None
+
+def fechas_historial():
+    """Fechas con fotos en el historial, ordenadas (solo lista carpetas, no lee datos)"""
+    if not os.path.isdir(DIRECTORIO_HISTORIAL):
+        return []
+    fechas = []
+    for nombre in os.listdir(DIRECTORIO_HISTORIAL):
+        if nombre.startswith("Fecha="):
+            fecha = pd.to_datetime(nombre[len("Fecha="):], format="%Y-%m-%d", errors='coerce')
+            if not pd.isna(fecha):
+                fechas.append(fecha)
+    return sorted(fechas)
+
+def _historial_vacio(columnas=None):
+    """DataFrame vacío con las columnas de una consulta al historial"""
+    return pd.DataFrame(columns=list(columnas or COLUMNAS_GENERAL) + ["Fecha"])
+
+@medido("lectura.historial")
+def leer_historial(desde=None, hasta=None, columnas=None):
+    """Filas de las semanas con Fecha entre desde y hasta (ambas incluidas).
+
+    Solo se leen las particiones de esas fechas y, si se indican, solo esas
+    columnas (las que falten en una foto quedan vacías). Devuelve un DataFrame con la columna Fecha y las columnas de
+    texto repetitivas como categorías.
+    """
+    import pyarrow.parquet as pq
+
+    partes = []
+    for fecha in fechas_historial():
+        if (desde is not None and fecha < pd.Timestamp(desde)) or (hasta is not None and fecha > pd.Timestamp(hasta)):
+            continue
+        directorio = _directorio_semana(fecha)
+        for nombre in sorted(os.listdir(directorio)):
+            if not nombre.endswith(".parquet"):
+                continue
+            ruta = os.path.join(directorio, nombre)
+            try:
+                if columnas is None:
+                    parte = pd.read_parquet(ruta)
+                else:
+                    # Las fotos antiguas pueden no tener todas las columnas: se
+                    # leen las que existen y las demás quedan vacías
+                    disponibles = set(pq.read_schema(ruta).names)
+                    parte = pd.read_parquet(ruta, columns=[col for col in columnas if col in disponibles])
+                    parte = parte.reindex(columns=list(columnas))
+            except Exception as e:
+                logger.warning("No se pudo leer %s del historial: %s", ruta, e)
+                continue
+            partes.append(parte.assign(Fecha=fecha))
+
+    if not partes:
+        return _historial_vacio(columnas)
+
+    # Al unir categorías distintas pandas vuelve a texto: se recodifican una vez
+    historial = pd.concat(partes, ignore_index=True)
+    categoricas = [col for col in COLUMNAS_CATEGORICAS if col in historial.columns]
+    return historial.astype({col: "category" for col in categoricas})
+
+def ultimas_semanas(n, columnas=None):
+    """Filas de las últimas n semanas del historial"""
+    fechas = fechas_historial()[-n:] if n > 0 else []
+    if not fechas:
+        return _historial_vacio(columnas)
+    return leer_historial(desde=fechas[0], hasta=fechas[-1], columnas=columnas)
+
+def _ruta_resumen(clave):
+    """Ruta en disco del resumen asociado a una clave"""
+    nombre = hashlib.sha1(repr(clave).encode('utf-8')).hexdigest()
+    return os.path.join(DIRECTORIO_CACHE_SEMANAL, f"{nombre}.pkl")
+
+def _clave_en_memoria(clave):
+    """Clave del resumen en el cache de proyectos: al guardar una versión nueva
+    de un archivo se descarta la anterior"""
+    file_id, modified_time, version = clave
+    return (f"resumen:{file_id}", (modified_time, version))
+
+def leer_resumen_cacheado(clave):
+    """Busca un resumen en memoria y luego en disco; None si no está cacheado"""
+    resumen = obtener(CACHE_RESUMENES, _clave_en_memoria(clave))
+    if resumen is not None:
+        return resumen
+    ruta = _ruta_resumen(clave)
+    try:
+        resumen = pd.read_pickle(ruta)
+        os.utime(ruta)
+    except Exception as e:
+        return None
+    return guardar(CACHE_RESUMENES, _clave_en_memoria(clave), resumen)
+
+def guardar_resumen(clave, resumen):
+    """Guarda un resumen en memoria y en disco"""
+    guardar(CACHE_RESUMENES, _clave_en_memoria(clave), resumen)
+    try:
+        os.makedirs(DIRECTORIO_CACHE_SEMANAL, exist_ok=True)
+        _escribir_atomico(_ruta_resumen(clave), resumen.to_pickle)
+    except Exception as e:
+        pass
+
+def _limpiar_cache_semanal():
+    """Borra los resúmenes en disco que no se han usado en DIAS_CACHE_SEMANAL días"""
+    try:
+        _limpiar_directorio(DIRECTORIO_CACHE_SEMANAL, DIAS_CACHE_SEMANAL)
+    except OSError as e:
+        pass
+
+def procesar_semana(fuente, ruta_historial):
+    """Lee un archivo semanal, guarda su foto en el historial y devuelve su resumen.
+
+    fuente es una ruta, un flujo o el contenido en bytes. Se ejecuta en el hilo
+    actual o en un proceso del pool, del que solo vuelve el resumen.
+    """
+    if isinstance(fuente, (bytes, bytearray)):
+        fuente = io.BytesIO(fuente)
+    dfw = leer_archivo_semanal(fuente)
+    try:
+        _guardar_foto(ruta_historial, dfw)
+    except Exception as e:
+        logger.warning("No se pudo guardar %s en el historial: %s", ruta_historial, e)
+    return resumir_semana(dfw)
+
+def _primer_intento_foto(clave):
+    """Registra que se leerá esa versión del archivo para guardar su foto en el
+    historial; False si ya se intentó en este proceso"""
+    with _fotos_lock:
+        if clave in _fotos_intentadas:
+            return False
+        _fotos_intentadas.add(clave)
+        return True
+
+def _obtener_pool(procesos):
+    """Pool de procesos compartido; se vuelve a crear si cambia el número de procesos"""
+    with _pool_lock:
+        if _pool["executor"] is None or _pool["procesos"] != procesos:
+            if _pool["executor"] is not None:
+                _pool["executor"].shutdown(wait=False)
+            # spawn: los procesos no heredan los hilos de Streamlit ni sus locks
+            _pool["executor"] = ProcessPoolExecutor(
+                max_workers=procesos, mp_context=multiprocessing.get_context("spawn")
+            )
+            _pool["procesos"] = procesos
+        return _pool["executor"]
+
+def _descartar_pool(executor):
+    """Descarta el pool si sigue siendo el compartido (p. ej. tras morir un proceso)"""
+    with _pool_lock:
+        if _pool["executor"] is executor:
+            _pool["executor"] = None
+    executor.shutdown(wait=False)
+
+def _usar_pool(pendientes, service, procesos):
+    """Indica si conviene resumir los archivos pendientes en el pool de procesos"""
+    if procesos <= 1 or len(pendientes) < MIN_ARCHIVOS_POOL:
+        return False
+    if service is not None:
+        return True
+    try:
+        return sum(os.path.getsize(ruta) for ruta in pendientes) >= MIN_BYTES_POOL
+    except OSError as e:
+        return False
+
+def _resumir_en_hilo(fuentes, rutas):
+    """Resume los archivos uno a uno en el hilo actual; genera (file_id, resumen)"""
+    for file_id, fuente in fuentes:
+        if not fuente:
+            continue
+        try:
+            yield file_id, procesar_semana(fuente, rutas[file_id])
+        except Exception as e:
+            continue
+
+def _resumir_en_pool(fuentes, rutas, procesos):
+    """Resume los archivos en el pool de procesos a medida que llegan; genera (file_id, resumen).
+
+    A los procesos se envía la ruta o el contenido del archivo y solo vuelve
+    el resumen. Si el pool no está disponible, los archivos se resumen en el
+    hilo actual.
+    """
+    pool = _obtener_pool(procesos)
+    futuros = {}
+    for file_id, fuente in fuentes:
+        if not fuente:
+            continue
+        envio = fuente if isinstance(fuente, (str, os.PathLike)) else fuente.getvalue()
+        try:
+            futuros[pool.submit(procesar_semana, envio, rutas[file_id])] = (file_id, fuente)
+        except Exception as e:
+            # El pool está cerrado o roto: se descarta para crearlo de nuevo la próxima vez
+            _descartar_pool(pool)
+            yield from _resumir_en_hilo([(file_id, fuente)], rutas)
+
+    for futuro in as_completed(futuros):
+        file_id, fuente = futuros[futuro]
+        try:
+            yield file_id, futuro.result()
+        except BrokenProcessPool as e:
+            _descartar_pool(pool)
+            yield from _resumir_en_hilo([(file_id, fuente)], rutas)
+        except Exception as e:
+            continue
+
+def extraer_fecha(nombre):
+    """Fecha de un archivo semanal a partir de su nombre; None si no tiene un formato conocido"""
+    # Intentar diferentes formatos de fecha
+    patterns = [
+        r"(\d{2}-\d{2}-\d{4})_AO_GENERAL\.txt",  # DD-MM-YYYY
+        r"(\d{2}-\d{2}-\d{2})_AO_GENERAL\.txt",  # DD-MM-YY
+        r"(\d{4}-\d{2}-\d{2})_AO_GENERAL\.txt",  # YYYY-MM-DD
+    ]
+    
+    for pattern in patterns:
+        m = re.match(pattern, nombre)
+        if m:
+            fecha_str = m.group(1)
+            try:
+                # Intentar diferentes formatos de fecha
+                if len(fecha_str.split('-')[2]) == 4:  # YYYY
+                    if len(fecha_str.split('-')[0]) == 2:  # DD-MM-YYYY
+                        return pd.to_datetime(fecha_str, format='%d-%m-%Y', dayfirst=True)
+                    else:  # YYYY-MM-DD
+                        return pd.to_datetime(fecha_str, format='%Y-%m-%d')
+                else:  # DD-MM-YY
+                    return pd.to_datetime(fecha_str, format='%d-%m-%y', dayfirst=True)
+            except:
+                continue
+    return None
+
+def ordenar_por_fecha(archivos):
+    """Lista de (archivo, fecha) ordenada por fecha, omitiendo los archivos sin fecha reconocible"""
+    archivos_fechas = [(f, extraer_fecha(f['name'])) for f in archivos]
+    return sorted(
+        [x for x in archivos_fechas if x[1] is not None], 
+        key=lambda x: x[1]
+    )
+
+def listar_semanales_drive(service, folder_id):
+    """Lista los archivos *_AO_GENERAL.txt de la carpeta semanal de Drive con su fecha"""
+    files = listar_archivos_carpeta(service, folder_id)
+    
+    # Filtrar solo archivos *_AO_GENERAL.txt
+    return ordenar_por_fecha([f for f in files if f['name'].endswith('_AO_GENERAL.txt')])
+
+def version_archivos(archivos):
+    """Identificador de un conjunto de archivos (file_id, modifiedTime, fecha)"""
+    return hashlib.sha1(repr(sorted(archivos, key=repr)).encode('utf-8')).hexdigest()
+
+@medido("agregacion.resumenes_semanales")
+def cargar_resumenes_semanales(archivos, service=None, creds=None,
+                               max_concurrentes=MAX_DESCARGAS_CONCURRENTES, procesos=PROCESOS_LECTURA):
+    """Obtiene el resumen de cada archivo semanal, descargando solo los nuevos o modificados.
+
+    archivos es una lista de (file_id, modifiedTime, fecha). Sin servicio, file_id
+    es la ruta local del archivo, que se lee directamente desde disco, y
+    modifiedTime su firma_archivo. Las descargas de Drive se hacen en paralelo y
+    cada archivo se procesa apenas llega; su foto completa se guarda además en
+    el historial por Fecha. Con historiales largos la lectura y el resumen se
+    reparten en un pool de procesos (ver _usar_pool). Devuelve una lista de (fecha, resumen)
+    en el mismo orden de archivos; los archivos sin datos válidos tienen un
+    resumen vacío y los que no se pudieron leer se omiten.
+    """
+    claves = {
+        file_id: (file_id, modified_time, VERSION_RESUMEN_SEMANAL)
+        for file_id, modified_time, _ in archivos
+    }
+
+    versiones = {file_id: (modified_time, fecha) for file_id, modified_time, fecha in archivos}
+    resultados = {}
+    nuevos = []
+
+    def registrar(file_id, resumen):
+        if resumen is None:
+            resumen = pd.DataFrame(columns=["Nivel", "Elementos", "FC_CON_TRISEMANAL", "VolumenHA"])
+        guardar_resumen(claves[file_id], resumen)
+        resultados[file_id] = resumen
+        nuevos.append(file_id)
+
+    pendientes = []
+    for file_id, clave in claves.items():
+        modified_time, fecha = versiones[file_id]
+        resumen = leer_resumen_cacheado(clave)
+        if resumen is not None:
+            resultados[file_id] = resumen
+            # Si falta la foto se agrega al historial al volver a leer el archivo,
+            # un solo intento por versión aunque el historial no se pueda escribir
+            if not en_historial(fecha, file_id, modified_time) and _primer_intento_foto(clave):
+                pendientes.append(file_id)
+            continue
+
+        # Si la foto ya está en el historial se resume sin volver a leer el archivo
+        dfw = leer_de_historial(fecha, file_id, modified_time)
+        if dfw is not None:
+            registrar(file_id, resumir_semana(dfw))
+        else:
+            _primer_intento_foto(clave)
+            pendientes.append(file_id)
+
+    if pendientes:
+        if service is None:
+            fuentes = ((file_id, file_id) for file_id in pendientes)
+        else:
+            fuentes = descargar_archivos(service, creds, pendientes, max_concurrentes)
+
+        rutas = {
+            file_id: _ruta_historial(versiones[file_id][1], file_id, versiones[file_id][0])
+            for file_id in pendientes
+        }
+        if _usar_pool(pendientes, service, procesos):
+            resumenes = _resumir_en_pool(fuentes, rutas, procesos)
+        else:
+            resumenes = _resumir_en_hilo(fuentes, rutas)
+        for file_id, resumen in resumenes:
+            registrar(file_id, resumen)
+
+    # Al escribir resúmenes nuevos, los de versiones anteriores quedan sin uso
+    if nuevos:
+        _limpiar_cache_semanal()
+
+    return [(fecha, resultados[file_id]) for file_id, _, fecha in archivos if file_id in resultados]
+
+@medido("agregacion.union_semanal")
+def unir_resumenes_semanales(resumenes):
+    """Une los resúmenes (fecha, DataFrame) en un único dataset semanal con columna Fecha"""
+    partes = [resumen.assign(Fecha=fecha) for fecha, resumen in resumenes if not resumen.empty]
+    if not partes:
+        return pd.DataFrame(columns=["Nivel", "Elementos", "FC_CON_TRISEMANAL", "VolumenHA", "Fecha"])
+    dataset = pd.concat(partes, ignore_index=True)
+    return dataset.astype({"FC_CON_TRISEMANAL": "category"})
+
+@medido("agregacion.avance_semanal")
+def avance_semanal(dataset):
+    """VolumenHA por (Nivel, Elementos, Fecha) sumando todas las semanas trisemanales"""
+    return dataset.groupby(["Nivel", "Elementos", "Fecha"], observed=True)["VolumenHA"].sum().reset_index()
+
+@medido("agregacion.avance_trisemanal")
+def avance_trisemanal(dataset, fechas):
+    """VolumenHA de 'Semana 01' por (Nivel, Elementos, Fecha) para las fechas indicadas"""
+    filas = dataset["Fecha"].isin(fechas) & dataset["FC_CON_TRISEMANAL"].isin([SEMANA_TRISEMANAL, SIN_TRISEMANAL])
+    return avance_semanal(dataset[filas])
+
+def filtrar_nivel_elemento(tabla, nivel, elemento):
+    """Filtra una tabla por Nivel y Elementos ('Todos' no filtra)"""
+    if nivel != "Todos":
+        tabla = tabla[tabla["Nivel"] == nivel]
+    if elemento != "Todos":
+        tabla = tabla[tabla["Elementos"] == elemento]
+    return tabla
+
+def columnas_texto(tabla):
+    """Copia de la tabla con nombres de columna de texto (las fechas como AAAA-MM-DD)"""
+    tabla = tabla.copy()
+    tabla.columns = [
+        col.strftime("%Y-%m-%d") if isinstance(col, pd.Timestamp) else str(col)
+        for col in tabla.columns
+    ]
+    return tabla
+
+def nombre_diferencia(anterior, actual):
+    """Nombre de la columna con la diferencia entre dos semanas de la tabla semanal"""
+    return f"Dif_{anterior.strftime('%d/%m')}_{actual.strftime('%d/%m')}"
+
+def totales_semanas(valores):
+    """Total y % Avance por fila de una matriz con solo las columnas de semanas.
+
+    El Total no incluye diferencias ni otras columnas derivadas.
+    """
+    total = valores.sum(axis=1)
+    totales = {"Total": total.round(2)}
+    if total.sum() > 0:
+        totales["% Avance"] = (total / total.sum() * 100).round(2)
+    return pd.DataFrame(totales)
+
+@medido("agregacion.pivot_semanal")
+def construir_pivot_semanal(df_semana, fechas):
+    """Tabla pivot (Nivel, Elementos) x Fecha con diferencias entre semanas y totales.
+
+    Las diferencias entre semanas consecutivas se calculan de una vez sobre la
+    matriz de valores y el Total suma solo las columnas de semanas.
+    """
+    # Crear tabla pivot para comparación
+    pivot = df_semana.pivot_table(
+        values="VolumenHA",
+        index=["Nivel", "Elementos"],
+        columns="Fecha",
+        aggfunc="sum",
+        fill_value=0
+    )
+    
+    # Semanas en orden de fecha
+    semanas = [fecha for fecha in fechas if fecha in pivot.columns]
+    valores = pivot[semanas].to_numpy(dtype=float)
+    
+    bloques = [pivot.index.to_frame(index=False), pd.DataFrame(valores.round(2), columns=semanas)]
+    
+    # Diferencias entre semanas consecutivas
+    if len(semanas) >= 2:
+        nombres = [nombre_diferencia(anterior, actual) for anterior, actual in zip(semanas[:-1], semanas[1:])]
+        bloques.append(pd.DataFrame(np.diff(valores, axis=1).round(2), columns=nombres))
+    
+    # Calcular totales
+    if semanas:
+        bloques.append(totales_semanas(valores))
+    
+    pivot_semanal = pd.concat(bloques, axis=1)
+    pivot_semanal.columns.name = pivot.columns.name
+    
+    # Ordenar por Nivel y Elemento para jerarquía visual
+    return pivot_semanal.sort_values(["Nivel", "Elementos"]).reset_index(drop=True)
+
+def ventana_semanal(pivot_semanal, fechas, ultimas=SEMANAS_VISIBLES):
+    """Tabla semanal con solo las últimas semanas.
+
+    Las semanas anteriores se reemplazan por una columna 'Acumulado al <fecha>'
+    con su suma, y solo se conservan las diferencias que terminan en una semana
+    visible; Total y % Avance no cambian.
+    """
+    semanas = [fecha for fecha in fechas if fecha in pivot_semanal.columns]
+    if not ultimas or len(semanas) <= ultimas:
+        return pivot_semanal
+    
+    anteriores = semanas[:-ultimas]
+    ocultas = anteriores + [
+        nombre_diferencia(anterior, actual)
+        for anterior, actual in zip(anteriores[:-1], anteriores[1:])
+    ]
+    tabla = pivot_semanal.drop(columns=[col for col in ocultas if col in pivot_semanal.columns])
+    acumulado = pivot_semanal[anteriores].to_numpy(dtype=float).sum(axis=1).round(2)
+    tabla.insert(2, f"Acumulado al {anteriores[-1].strftime('%d/%m/%Y')}", acumulado)
+    return tabla
+
+def tabla_para_mostrar(tabla):
+    """Copia de la tabla con las columnas float64 en float32 para enviarla al navegador"""
+    flotantes = tabla.select_dtypes(include=["float64"]).columns
+    return tabla.astype({col: "float32" for col in flotantes})
+
+@medido("agregacion.series_tendencia")
+def series_tendencia(df_semana, agrupar=None):
+    """VolumenHA semanal y acumulado de cada grupo para el gráfico de tendencia.
+
+    Devuelve {"Semanal": tabla, "Acumulado": tabla}, con una fila por Fecha y
+    una columna por valor de agrupar ('Nivel' o 'Elementos'); sin agrupar hay
+    una sola columna 'Total'.
+    """
+    if agrupar is None:
+        semanal = df_semana.groupby("Fecha")["VolumenHA"].sum().to_frame("Total")
+    else:
+        semanal = df_semana.pivot_table(
+            values="VolumenHA", index="Fecha", columns=agrupar, aggfunc="sum", fill_value=0, observed=True
+        )
+    semanal = semanal.sort_index()
+    return {"Semanal": semanal, "Acumulado": semanal.cumsum()}
+
+def reducir_serie(x, y, puntos=PUNTOS_TENDENCIA):
+    """Índices de a lo más `puntos` puntos que conservan la forma de la serie.
+
+    Usa Largest-Triangle-Three-Buckets: conserva el primer y el último punto y,
+    de cada tramo intermedio, el que forma el triángulo de mayor área con el
+    punto elegido antes y el promedio del tramo siguiente, así se mantienen
+    los picos y cambios de pendiente.
+    """
+    n = len(y)
+    if puntos < 3 or n <= puntos:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    bordes = np.linspace(1, n - 1, puntos - 1).astype(int)
+    indices = np.empty(puntos, dtype=int)
+    indices[0], indices[-1] = 0, n - 1
+    elegido = 0
+    for i in range(puntos - 2):
+        inicio, fin = bordes[i], bordes[i + 1]
+        siguiente = bordes[i + 2] if i + 2 < len(bordes) else n
+        cx, cy = x[fin:siguiente].mean(), y[fin:siguiente].mean()
+        areas = np.abs(
+            (x[elegido] - cx) * (y[inicio:fin] - y[elegido]) - (x[elegido] - x[inicio:fin]) * (cy - y[elegido])
+        )
+        elegido = inicio + int(np.argmax(areas))
+        indices[i + 1] = elegido
+    return indices
+
+@medido("agregacion.series_grafico")
+def series_para_grafico(series, puntos=PUNTOS_TENDENCIA):
+    """Series de series_tendencia en formato largo (Grupo, Fecha, VolumenHA), con a lo más `puntos` por grupo"""
+    fechas = pd.DatetimeIndex(series.index)
+    x = fechas.asi8.astype(float)
+    partes = []
+    for grupo in series.columns:
+        y = series[grupo].to_numpy(dtype=float)
+        indices = reducir_serie(x, y, puntos)
+        partes.append(pd.DataFrame({"Grupo": str(grupo), "Fecha": fechas[indices], "VolumenHA": y[indices].round(2)}))
+    if not partes:
+        return pd.DataFrame(columns=["Grupo", "Fecha", "VolumenHA"])
+    return pd.concat(partes, ignore_index=True).astype({"Grupo": "category"})
+
+@medido("agregacion.pivot_trisemanal")
+def construir_pivot_trisemanal(df_semana, fechas):
+    """Tabla pivot (Nivel, Elementos) x Fecha de las dos últimas semanas con su diferencia"""
+    # Crear tabla pivot para comparación
+    pivot_trisemanal = df_semana.pivot_table(
+        values="VolumenHA",
+        index=["Nivel", "Elementos"],
+        columns="Fecha",
+        aggfunc="sum",
+        fill_value=0
+    ).reset_index()
+    
+    # Calcular diferencia entre las dos semanas
+    if len(fechas) == 2:
+        col_actual = fechas[1]
+        col_anterior = fechas[0]
+        if col_actual in pivot_trisemanal.columns and col_anterior in pivot_trisemanal.columns:
+            pivot_trisemanal["Diferencia"] = pivot_trisemanal[col_actual] - pivot_trisemanal[col_anterior]
+    
+    # Calcular totales solo sobre las semanas, como en la tabla semanal
+    semanas = [fecha for fecha in fechas if fecha in pivot_trisemanal.columns]
+    if semanas:
+        totales = totales_semanas(pivot_trisemanal[semanas].to_numpy(dtype=float))
+        for col in totales.columns:
+            pivot_trisemanal[col] = totales[col].to_numpy()
+    
+    # Formatear columnas numéricas
+    for col in pivot_trisemanal.select_dtypes(include=[np.number]).columns:
+        pivot_trisemanal[col] = pivot_trisemanal[col].round(2)
+    
+    # Ordenar por Nivel y Elemento para jerarquía visual
+    return pivot_trisemanal.sort_values(["Nivel", "Elementos"]).reset_index(drop=True)
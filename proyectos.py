@@ -0,0 +1,149 @@
+import collections
+import sys
+import threading
+
+import pandas as pd
+
+from diagnostico import contar_cache, tramo
+
+# Memoria máxima (MB) de los datos cacheados de todos los proyectos; al
+# superarla se descartan primero los proyectos usados hace más tiempo
+PRESUPUESTO_MEMORIA_MB = 1024
+
+# Clave del proyecto con que se cachean los archivos locales
+PROYECTO_LOCAL = "local"
+
+# Datos en memoria de cada proyecto, del proyecto usado hace más tiempo al más
+# reciente: proyecto -> {clave: (valor, bytes)}, también del menos al más usado
+_proyectos = collections.OrderedDict()
+_presupuesto = {"bytes": PRESUPUESTO_MEMORIA_MB * 1_000_000}
+_lock = threading.Lock()
+
+# Funciones que se llaman con la clave de cada proyecto descartado
+_al_descartar = []
+
+def registro_proyectos(config=None, file_id=None, folder_id=None):
+    """Proyectos configurados: clave -> {"nombre", "file_id", "folder_id"}.
+
+    config es la tabla PROYECTOS de los secretos, con una subtabla por proyecto
+    (nombre, FILE_ID_GENERAL y FOLDER_ID_SEMANAL). Sin ella se usa un único
+    proyecto con file_id y folder_id, como en la configuración anterior.
+    """
+    proyectos = {}
+    for clave, datos in dict(config or {}).items():
+        try:
+            proyectos[str(clave)] = {
+                "nombre": datos.get("nombre", str(clave)),
+                "file_id": datos.get("FILE_ID_GENERAL"),
+                "folder_id": datos.get("FOLDER_ID_SEMANAL"),
+            }
+        except Exception as e:
+            continue
+    if not proyectos:
+        proyectos["principal"] = {"nombre": "Principal", "file_id": file_id, "folder_id": folder_id}
+    return proyectos
+
+def fijar_presupuesto(megabytes):
+    """Cambia la memoria máxima de los datos cacheados de todos los proyectos"""
+    with _lock:
+        _presupuesto["bytes"] = megabytes * 1_000_000
+
+def al_descartar(funcion):
+    """Registra una función que se llama con la clave de cada proyecto descartado"""
+    if funcion not in _al_descartar:
+        _al_descartar.append(funcion)
+
+def tamano_en_memoria(valor):
+    """Bytes aproximados de un valor cacheado (DataFrames y colecciones de ellos)"""
+    if isinstance(valor, pd.DataFrame):
+        return int(valor.memory_usage(deep=True).sum())
+    if isinstance(valor, pd.Series):
+        return int(valor.memory_usage(deep=True))
+    if isinstance(valor, dict):
+        return sys.getsizeof(valor) + sum(tamano_en_memoria(v) for v in valor.values())
+    if isinstance(valor, (list, tuple)):
+        return sys.getsizeof(valor) + sum(tamano_en_memoria(v) for v in valor)
+    return sys.getsizeof(valor)
+
+def en_memoria(proyecto):
+    """Indica si el proyecto tiene datos cacheados (no fue descartado)"""
+    with _lock:
+        return bool(_proyectos.get(proyecto))
+
+def obtener(proyecto, clave):
+    """Valor cacheado del proyecto, o None; lo marca como el más recién usado"""
+    with _lock:
+        datos = _proyectos.get(proyecto)
+        if datos is None or clave not in datos:
+            return None
+        datos[clave] = datos.pop(clave)
+        _proyectos.move_to_end(proyecto)
+        return datos[clave][0]
+
+def guardar(proyecto, clave, valor):
+    """Guarda un valor en el cache del proyecto y lo devuelve.
+
+    clave es (grupo, versión, ...): al guardar una versión se descartan las
+    otras versiones del mismo grupo. Si se supera el presupuesto de memoria se
+    descartan los proyectos usados hace más tiempo y, si el proyecto actual
+    solo ya lo supera, sus valores usados hace más tiempo.
+    """
+    tamano = tamano_en_memoria(valor)
+    with _lock:
+        datos = _proyectos.setdefault(proyecto, {})
+        for anterior in [c for c in datos if c[0] == clave[0] and c[1] != clave[1]]:
+            del datos[anterior]
+        datos.pop(clave, None)
+        datos[clave] = (valor, tamano)
+        _proyectos.move_to_end(proyecto)
+        descartados = _liberar(proyecto, clave)
+    for descartado in descartados:
+        for funcion in _al_descartar:
+            try:
+                funcion(descartado)
+            except Exception as e:
+                continue
+    return valor
+
+def _uso_total():
+    return sum(tamano for datos in _proyectos.values() for _, tamano in datos.values())
+
+def _liberar(actual, clave):
+    """Descarta datos hasta respetar el presupuesto; devuelve los proyectos descartados"""
+    descartados = []
+    uso = _uso_total()
+    while uso > _presupuesto["bytes"] and len(_proyectos) > 1:
+        proyecto, datos = _proyectos.popitem(last=False)
+        uso -= sum(tamano for _, tamano in datos.values())
+        descartados.append(proyecto)
+    datos = _proyectos[actual]
+    while uso > _presupuesto["bytes"] and len(datos) > 1:
+        antigua = next(c for c in datos if c != clave)
+        uso -= datos.pop(antigua)[1]
+    return descartados
+
+def memo(proyecto, clave, calcular, nombre=None):
+    """Devuelve el valor cacheado del proyecto o lo calcula y lo guarda (None no se cachea)"""
+    nombre = nombre or f"proyecto.{clave[0]}"
+    valor = obtener(proyecto, clave)
+    contar_cache(nombre, valor is not None)
+    if valor is not None:
+        return valor
+    with tramo(nombre):
+        valor = calcular()
+    if valor is not None:
+        guardar(proyecto, clave, valor)
+    return valor
+
+def descartar(proyecto):
+    """Elimina todos los datos cacheados del proyecto"""
+    with _lock:
+        _proyectos.pop(proyecto, None)
+
+def uso_memoria():
+    """Bytes cacheados por proyecto, del más al menos recién usado"""
+    with _lock:
+        return {
+            proyecto: sum(tamano for _, tamano in datos.values())
+            for proyecto, datos in reversed(_proyectos.items())
+        }
@@ -0,0 +1,163 @@
+"""Genera sin Streamlit los reportes del dashboard en Parquet, Excel o CSV.
+
+Escribe el avance general de las tres métricas, el avance semanal y la
+comparación trisemanal con la misma lectura, caches y agregaciones que el
+dashboard: el AO_GENERAL se carga una vez y de un solo cubo salen las tres
+métricas, y los archivos semanales se resumen en paralelo (descargas
+concurrentes y pool de procesos) y alimentan las dos vistas semanales.
+
+Uso:
+    python reporte.py --salida reportes
+    python reporte.py --credenciales cuenta.json --file-id ID --folder-id ID --formato parquet excel
+"""
+import argparse
+import json
+import os
+import sys
+
+import pandas as pd
+
+from diagnostico import activar_log, ejecucion
+from drive import (
+    crear_credenciales, construir_servicio, descargar_flujo, obtener_metadatos, MAX_DESCARGAS_CONCURRENTES
+)
+from procesamiento import (
+    avance_semanal, avance_trisemanal, cargar_ao_general_local, cargar_ao_general_version,
+    cargar_resumenes_semanales, construir_pivot_semanal, construir_pivot_trisemanal, firma_archivo,
+    columnas_texto, listar_semanales_drive, ordenar_por_fecha, resumenes_avance, unir_resumenes_semanales,
+    PROCESOS_LECTURA
+)
+
+FORMATOS = ["parquet", "excel", "csv"]
+
+def crear_servicio(ruta_credenciales):
+    """Credenciales y servicio de Drive a partir del JSON de una Service Account"""
+    with open(ruta_credenciales, encoding="utf-8") as f:
+        creds = crear_credenciales(json.load(f))
+    if creds is None:
+        return None, None
+    return construir_servicio(creds), creds
+
+def cargar_general(args, service):
+    """AO_GENERAL desde Drive (por versión, con el cache Parquet) o desde el archivo local"""
+    if service is not None and args.file_id:
+        metadatos = obtener_metadatos(service, args.file_id)
+        version = metadatos.get('md5Checksum') or metadatos.get('modifiedTime')
+        return cargar_ao_general_version(version, lambda: descargar_flujo(service, args.file_id))
+    if os.path.exists(args.general):
+        return cargar_ao_general_local(args.general)
+    return None
+
+def archivos_semanales(args, service):
+    """(file_id, modifiedTime, fecha) de los archivos semanales, ordenados por fecha"""
+    if service is not None and args.folder_id:
+        return [(f['id'], f.get('modifiedTime'), fecha) for f, fecha in listar_semanales_drive(service, args.folder_id)]
+    if not os.path.isdir(args.semanal):
+        return []
+    nombres = [{"name": n} for n in os.listdir(args.semanal) if n.endswith('_AO_GENERAL.txt')]
+    archivos = []
+    for f, fecha in ordenar_por_fecha(nombres):
+        ruta = os.path.join(args.semanal, f['name'])
+        archivos.append((ruta, firma_archivo(ruta), fecha))
+    return archivos
+
+def calcular_reportes(df, resumenes, archivos):
+    """Tablas de todas las vistas del dashboard: nombre -> DataFrame"""
+    tablas = {}
+    if df is not None:
+        for valor_col, resumen in resumenes_avance(df).items():
+            if resumen is not None:
+                tablas[f"avance_{valor_col}"] = resumen
+
+    dataset = unir_resumenes_semanales(resumenes)
+    if dataset.empty:
+        return tablas
+
+    df_semana = avance_semanal(dataset)
+    fechas = sorted(df_semana["Fecha"].unique())
+    tablas["semanal"] = construir_pivot_semanal(df_semana, fechas)
+
+    # La comparación trisemanal usa los dos últimos archivos, como el dashboard
+    df_tri = avance_trisemanal(dataset, [fecha for _, _, fecha in archivos[-2:]])
+    fechas_tri = sorted(df_tri["Fecha"].unique())
+    if len(fechas_tri) == 2:
+        tablas["trisemanal"] = construir_pivot_trisemanal(df_tri, fechas_tri)
+    return tablas
+
+def escribir_reportes(tablas, salida, formatos):
+    """Escribe las tablas en la carpeta de salida; devuelve las rutas escritas.
+
+    Parquet y CSV generan un archivo por tabla; Excel, un libro con una hoja
+    por tabla (requiere openpyxl).
+    """
+    os.makedirs(salida, exist_ok=True)
+    tablas = {nombre: columnas_texto(tabla) for nombre, tabla in tablas.items()}
+    rutas = []
+    for formato in formatos:
+        if formato == "excel":
+            ruta = os.path.join(salida, "reporte.xlsx")
+            try:
+                with pd.ExcelWriter(ruta) as libro:
+                    for nombre, tabla in tablas.items():
+                        tabla.to_excel(libro, sheet_name=nombre[:31], index=False)
+            except ImportError as e:
+                print(f"No se pudo escribir {ruta}: {e}", file=sys.stderr)
+                continue
+            rutas.append(ruta)
+            continue
+        for nombre, tabla in tablas.items():
+            ruta = os.path.join(salida, f"{nombre}.{formato}")
+            if formato == "parquet":
+                tabla.to_parquet(ruta, index=False)
+            else:
+                tabla.to_csv(ruta, index=False, encoding="utf-8")
+            rutas.append(ruta)
+    return rutas
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--salida", default="reportes", help="carpeta donde se escriben los reportes")
+    parser.add_argument("--formato", nargs="+", choices=FORMATOS, default=["parquet"])
+    parser.add_argument("--general", default="AO_GENERAL.txt", help="AO_GENERAL local (sin --file-id)")
+    parser.add_argument("--semanal", default="REPORTE SEMANAL", help="carpeta semanal local (sin --folder-id)")
+    parser.add_argument("--credenciales", help="JSON de la Service Account para leer desde Google Drive")
+    parser.add_argument("--file-id", help="ID del AO_GENERAL en Drive")
+    parser.add_argument("--folder-id", help="ID de la carpeta REPORTE SEMANAL en Drive")
+    parser.add_argument("--procesos", type=int, default=PROCESOS_LECTURA,
+                        help="procesos para resumir los archivos semanales (1 = en el proceso actual)")
+    parser.add_argument("--diagnostico", action="store_true", help="escribe en consola los tiempos por tramo")
+    args = parser.parse_args(argv)
+
+    if args.diagnostico:
+        activar_log()
+
+    service, creds = None, None
+    if args.credenciales:
+        service, creds = crear_servicio(args.credenciales)
+        if service is None:
+            print("No se pudieron crear las credenciales de Google Drive", file=sys.stderr)
+            return 1
+
+    with ejecucion():
+        try:
+            df = cargar_general(args, service)
+        except Exception as e:
+            print(f"No se pudo leer el AO_GENERAL desde Google Drive: {e}", file=sys.stderr)
+            return 1
+        archivos = archivos_semanales(args, service)
+        resumenes = cargar_resumenes_semanales(
+            archivos, service=service, creds=creds,
+            max_concurrentes=MAX_DESCARGAS_CONCURRENTES, procesos=args.procesos
+        ) if archivos else []
+        tablas = calcular_reportes(df, resumenes, archivos)
+        rutas = escribir_reportes(tablas, args.salida, args.formato) if tablas else []
+
+    if not tablas:
+        print("No se encontraron datos para generar reportes", file=sys.stderr)
+        return 1
+    for ruta in rutas:
+        print(ruta)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())